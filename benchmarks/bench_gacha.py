@@ -0,0 +1,58 @@
+# ------------------------------
+# ガチャの速度: NumPy でまとめて抽選 vs 1回ずつ Python でループ
+#   python benchmarks/bench_gacha.py [回数]
+# ------------------------------
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from catalog import GACHA_RARITY_IDS, ITEM_NAMES, RARITY_ORDER  # noqa: E402
+from gacha import GACHA_PITY, GACHA_RATES, Gacha  # noqa: E402
+
+
+def pull_loop(count, counters):
+    """比較用: 1回ずつ抽選して天井も1回ずつ数える素朴な実装"""
+    weights = [GACHA_RATES[r] for r in RARITY_ORDER]
+    pity = {RARITY_ORDER.index(r): limit for r, limit in GACHA_PITY.items()}
+    items = {}
+    for _ in range(count):
+        level = random.choices(range(len(RARITY_ORDER)), weights)[0]
+        for pity_level in sorted(pity, reverse=True):
+            name = RARITY_ORDER[pity_level]
+            if level >= pity_level:
+                counters[name] = 0
+            elif counters.get(name, 0) == pity[pity_level] - 1:
+                level = pity_level
+                counters[name] = 0
+            else:
+                counters[name] = counters.get(name, 0) + 1
+        item = ITEM_NAMES[random.choice(GACHA_RARITY_IDS[RARITY_ORDER[level]])]
+        items[item] = items.get(item, 0) + 1
+    return items
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    gacha = Gacha(seed=0)
+
+    start = time.perf_counter()
+    _, rarities, _ = gacha.pull(count, {})
+    vectorized = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pull_loop(count, {})
+    loop = time.perf_counter() - start
+
+    print(f"{count:,} 連")
+    print(f"  NumPy まとめて: {vectorized * 1000:9.1f} ms  ({count / vectorized:,.0f} 回/秒)")
+    print(f"  Python ループ:  {loop * 1000:9.1f} ms  ({count / loop:,.0f} 回/秒)")
+    print(f"  倍率: x{loop / vectorized:.1f}")
+    print("  レアリティ:", ", ".join(f"{r} {n / count:.2%}" for r, n in rarities.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# ------------------------------
+# 保存中にイベントループがどれだけ止まるか: その場で保存 vs 保存用スレッド
+#   python benchmarks/bench_loop_stall.py [プレイヤー数] [保存回数]
+# ------------------------------
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_persistence import ITEMS, make_players  # noqa: E402
+from inventory import migrate_players  # noqa: E402
+from metrics import LoopLagMonitor  # noqa: E402
+from storage import JsonBackend, PlayerStore  # noqa: E402
+
+
+def fake_mine(players, user_id):
+    inv = players[user_id]["inventory"]
+    item = random.choice(ITEMS)
+    inv[item] = inv.get(item, 0) + 1
+
+
+async def run(players, path, saves, use_thread):
+    store = PlayerStore(players, JsonBackend(path), max_dirty=10**9)
+    monitor = LoopLagMonitor(interval=0.001, window=10**6)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    monitor.reset()
+
+    start = time.perf_counter()
+    for _ in range(saves):
+        # コマンドを何件か処理してから保存する
+        for _ in range(20):
+            fake_mine(players, random.choice(list(players)))
+            store.mark_dirty(random.choice(list(players)))
+            await asyncio.sleep(0)
+        if use_thread:
+            await store.flush_async()
+        else:
+            store.flush()
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    monitor.stop()
+    store.close()
+    return elapsed, monitor.summary()
+
+
+def main():
+    player_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    saves = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    random.seed(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "game_data.json")
+        results = {}
+        for label, use_thread in (("その場で保存", False), ("保存用スレッド", True)):
+            players = migrate_players(make_players(player_count))
+            results[label] = asyncio.run(run(players, path, saves, use_thread))
+        size = os.path.getsize(path) / 1024 / 1024
+
+    print(f"プレイヤー {player_count} 人（{size:.1f} MB）, 保存 {saves} 回")
+    for label, (elapsed, (avg, p99, worst)) in results.items():
+        print(f"  {label}: ループの遅れ 平均 {avg:6.2f} ms / 99% {p99:7.2f} ms / 最大 {worst:7.2f} ms"
+              f"  （全体 {elapsed:.2f} 秒）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# ------------------------------
+# マインスイーパーの解析: 盤面の大きさごとの「運に頼らず解ける率」と時間、ヒント1回の時間
+#   python benchmarks/bench_minesweeper_solver.py [盤面数]
+# ------------------------------
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from minesweeper import Minefield  # noqa: E402
+from minesweeper_solver import board_view, generate_solvable, hint, is_solvable  # noqa: E402
+
+SIZES = [
+    ("easy", 5, 4, 3),
+    ("normal", 7, 7, 10),
+    ("hard", 9, 9, 20),
+    ("16x16", 16, 16, 40),
+    ("30x16", 30, 16, 99),
+]
+
+
+def solve_rate(width, height, bombs, count, rng):
+    start = (height // 2) * width + width // 2
+    solved = 0
+    elapsed = 0.0
+    hint_time = 0.0
+    hints = 0
+    for _ in range(count):
+        field = Minefield(width, height, bombs, rng)
+        field.place(start)
+        t = time.perf_counter()
+        if is_solvable(field, start, time.perf_counter() + 10.0):
+            solved += 1
+        elapsed += time.perf_counter() - t
+        if not field.won:
+            # 詰まった局面（いちばん重い、確率を出すところ）でヒントを1回
+            t = time.perf_counter()
+            hint(width, height, board_view(field), bombs)
+            hint_time += time.perf_counter() - t
+            hints += 1
+    return solved, elapsed, hint_time / max(hints, 1)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = np.random.default_rng(0)
+    print(f"各 {count} 盤面（真ん中から開け始める）")
+    print(f"  {'盤面':<8}{'解ける率':>8}{'判定/盤面':>12}{'ヒント':>10}{'生成':>10}{'試行':>6}")
+    for name, width, height, bombs in SIZES:
+        solved, elapsed, hint_time = solve_rate(width, height, bombs, count, rng)
+        generate_count = max(1, count // 10)
+        t = time.perf_counter()
+        tries = 0
+        for _ in range(generate_count):
+            _, n = generate_solvable(width, height, bombs, (height // 2) * width + width // 2)
+            tries += n
+        generate = (time.perf_counter() - t) / generate_count
+        print(
+            f"  {name:<8}{solved / count:>8.0%}{elapsed / count * 1000:>10.2f}ms"
+            f"{hint_time * 1000:>8.2f}ms{generate * 1000:>8.1f}ms{tries / generate_count:>6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# ------------------------------
+# 保存方式のベンチマーク: 毎回 save_data() vs 遅延書き込み（PlayerStore）
+#   python benchmarks/bench_persistence.py [プレイヤー数] [コマンド数]
+# ------------------------------
+
+import copy
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from storage import JsonBackend, PlayerStore  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+ITEMS = ["石", "丸石", "木材", "パン", "焼き豚", "鉄", "金", "ダイヤモンド"]
+
+
+def make_players(count):
+    """game_data.json のプレイヤーを複製して大きなデータを作る"""
+    with open(os.path.join(ROOT, "game_data.json"), "r", encoding="utf-8") as f:
+        base = list(json.load(f)["player_data"].values())
+    return {str(i): copy.deepcopy(base[i % len(base)]) for i in range(count)}
+
+
+def fake_mine(players, user_id):
+    players[user_id]["inventory"].append(random.choice(ITEMS))
+    players[user_id]["exp"] += random.randint(1, 5)
+
+
+def bench_old(players, path, commands):
+    # 今までの方式: コマンドごとに全員分を indent=2 で書き直す
+    start = time.perf_counter()
+    for _ in range(commands):
+        fake_mine(players, random.choice(list(players)))
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"player_data": dict(players)}, f, ensure_ascii=False, indent=2)
+    return time.perf_counter() - start
+
+
+def bench_store(players, path, commands):
+    store = PlayerStore(players, JsonBackend(path))
+    start = time.perf_counter()
+    for _ in range(commands):
+        user_id = random.choice(list(players))
+        fake_mine(players, user_id)
+        store.mark_dirty(user_id)
+    store.close()
+    return time.perf_counter() - start
+
+
+def main():
+    player_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    commands = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    random.seed(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "game_data.json")
+        old = bench_old(make_players(player_count), path, commands)
+        size = os.path.getsize(path) / 1024 / 1024
+        new = bench_store(make_players(player_count), path, commands)
+
+    print(f"プレイヤー {player_count} 人（{size:.1f} MB）, コマンド {commands} 回")
+    print(f"  毎回 save_data():  {commands / old:10.1f} コマンド/秒")
+    print(f"  PlayerStore:       {commands / new:10.1f} コマンド/秒")
+    print(f"  倍率: x{old / new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
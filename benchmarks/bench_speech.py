@@ -0,0 +1,100 @@
+# ------------------------------
+# on_message の発言モード変換: 今までの lambda + player_data vs speech.py
+#   python benchmarks/bench_speech.py [メッセージ数]
+# ------------------------------
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from speech import SpeechModes  # noqa: E402
+from storage import LazyPlayers, SqliteBackend  # noqa: E402
+
+OLD_MODE_PHRASES = {
+    "猫": lambda s: s + "にゃん♪",
+    "お嬢様": lambda s: "わたくし、" + s + "でございますわ。",
+    "中二病": lambda s: s.replace("です", "なのだ").replace("ます", "なのだ"),
+    "執事": lambda s: "かしこまりました。" + s,
+    "幼女": lambda s: s.replace("です", "だよ").replace("ます", "だよ"),
+    "ロボ": lambda s: s.replace("です", "デス").replace("ます", "デス"),
+    "さくらみこ": lambda s: s + "みこ～",
+}
+TEXTS = [
+    "おはよう", "今日は雨ですね", "!mine 10", "それな", "明日は学校に行きます",
+    "草", "ガチャ100連した結果ｗｗｗ", "よろしくお願いします", "了解", "www",
+]
+
+
+def make_players(count, mode_ratio):
+    modes = list(OLD_MODE_PHRASES)
+    players = {}
+    for i in range(count):
+        # 実際と同じく、ほとんどの人はモードなし（「平和」）
+        mode = random.choice(modes) if random.random() < mode_ratio else "平和"
+        players[str(i)] = {"inventory": {}, "level": 1, "exp": 0, "mode": mode}
+    return players
+
+
+def old_hook(player_data, user_id, content):
+    if user_id in player_data:
+        mode = player_data[user_id].get("mode", "平和")
+        func = OLD_MODE_PHRASES.get(mode)
+        if func:
+            new_content = func(content)
+            if new_content != content:
+                return new_content
+    return None
+
+
+def new_hook(speech_modes, user_id, content):
+    if not speech_modes.by_user:
+        return None
+    return speech_modes.convert(user_id, content)
+
+
+def run(hook, state, messages):
+    start = time.perf_counter()
+    changed = 0
+    for user_id, content in messages:
+        if hook(state, user_id, content) is not None:
+            changed += 1
+    return time.perf_counter() - start, changed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    random.seed(0)
+    players = make_players(5000, 0.05)
+    speech_modes = SpeechModes()
+    speech_modes.build((user_id, p["mode"]) for user_id, p in players.items())
+    # 発言者の1割はまだ登録していない人
+    user_ids = list(players) + [str(10_000 + i) for i in range(500)]
+    messages = [(random.choice(user_ids), random.choice(TEXTS)) for _ in range(count)]
+
+    old, old_changed = run(old_hook, players, messages)
+    new, new_changed = run(new_hook, speech_modes, messages)
+    assert old_changed == new_changed
+
+    # STORAGE_BACKEND=sqlite: player_data を引くとメモリにいない人はDBから読み込まれる
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SqliteBackend(os.path.join(tmp, "game_data.db"))
+        backend.save(players, list(players))
+        lazy = LazyPlayers(dict)
+        lazy.load_ids(backend)
+        lazy_count = min(count, 100_000)
+        lazy_old, _ = run(old_hook, lazy, messages[:lazy_count])
+        backend.close()
+
+    print(f"{count:,} メッセージ（変換 {new_changed:,} 件）")
+    print(f"  lambda + player_data:          {count / old:12,.0f} メッセージ/秒")
+    print(f"  lambda + player_data (sqlite): {lazy_count / lazy_old:12,.0f} メッセージ/秒")
+    print(f"  speech.py:                     {count / new:12,.0f} メッセージ/秒")
+    print(f"  倍率: x{old / new:.1f}（sqlite 比 x{lazy_old / lazy_count * count / new:.1f}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# ------------------------------
+# 起動時の読み込み時間: 全員読み込み vs LazyPlayers（必要な人だけ読み込む）
+#   python benchmarks/bench_startup.py [プレイヤー数]
+# ------------------------------
+
+import copy
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from storage import JsonBackend, LazyPlayers, PlayerStore, SqliteBackend, atomic_write_json  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def make_players(count):
+    """game_data.json のプレイヤーを複製して大きなデータを作る"""
+    with open(os.path.join(ROOT, "game_data.json"), "r", encoding="utf-8") as f:
+        base = list(json.load(f)["player_data"].values())
+    return {str(i): copy.deepcopy(base[i % len(base)]) for i in range(count)}
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    player_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    players = make_players(player_count)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "game_data.json")
+        db_path = os.path.join(tmp, "game_data.db")
+        atomic_write_json(json_path, {"player_data": players})
+        backend = SqliteBackend(db_path)
+        backend.save(players, list(players))
+        backend.close()
+
+        json_store = PlayerStore({}, JsonBackend(json_path))
+        json_ms, _ = timed(json_store.load)
+
+        sqlite_store = PlayerStore({}, SqliteBackend(db_path))
+        sqlite_ms, _ = timed(sqlite_store.load)
+
+        lazy = LazyPlayers(dict)
+        lazy_store = PlayerStore(lazy, SqliteBackend(db_path))
+        lazy_ms, _ = timed(lazy_store.load)
+
+        user_id = random.choice(list(players))
+        cold_ms, _ = timed(lambda: lazy[user_id])
+        warm_ms, _ = timed(lambda: lazy[user_id])
+
+        for store in (json_store, sqlite_store, lazy_store):
+            store.close()
+
+    print(f"プレイヤー {player_count} 人")
+    print(f"  JSON 全員読み込み:        {json_ms:9.2f} ms")
+    print(f"  SQLite 全員読み込み:      {sqlite_ms:9.2f} ms")
+    print(f"  LazyPlayers 起動:         {lazy_ms:9.2f} ms（読み込み 0 人）")
+    print(f"  初回アクセス（コールド）: {cold_ms:9.3f} ms")
+    print(f"  2回目以降（ウォーム）:    {warm_ms:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,6 @@
 # ------------------------------
 
 import os
-import json
 import random
 import re
 from collections import defaultdict
@@ -15,8 +14,29 @@ from discord import Embed
 import asyncio
 from datetime import datetime
 import pytz
-import aiohttp
-import math
+from catalog import (
+    SHOP_ITEMS, BUILDING_REWARDS, EQUIP_WEAPONS, EQUIP_ARMOR, RARITY_ORDER,
+    attack_range, defense_of,
+)
+from drops import MINE_TABLE, roll_mine_exp, apply_exp
+from gacha import GACHA, GACHA_COST
+from indexes import NameIndex, Rankings, normalize_name
+from inventory import add_item
+from transactions import PlayerLocks, Escrow
+from storage import PlayerStore, JsonBackend, SqliteBackend, JournalBackend, LazyPlayers, DB_FILE, JOURNAL_FILE
+from metrics import LoopLagMonitor
+from http_client import HttpClient
+from ratelimit import RateLimiter, RateLimited
+from speech import MODE_PHRASES, SpeechModes
+from outbox import Outbox, REPLY
+from replies import ReplyRouter
+from connect4 import COLUMNS, Connect4, best_move
+from tictactoe import TicTacToe
+from minesweeper import Minefield, TextBoard
+from minesweeper_solver import GENERATE_TIME, HINT_TIME, board_view, generate_solvable, hint
+import workers
+from calc import CalcError, calculate
+from weather import GEOCODE_CACHE, WEATHER_CACHE, WEATHER_DESC, MAX_TENKI_CITIES, lookup_weather
 
 
 
@@ -29,7 +49,41 @@ DEST_CHANNEL_ID = int(os.getenv("DEST_CHANNEL_ID"))
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
-bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
+
+
+class GolemBot(commands.Bot):
+    async def on_command_error(self, ctx, error):
+        if isinstance(error, RateLimited):
+            # 連打された分には返事をしない（通知はたまに1回だけ）
+            if rate_limiter.should_notice(ctx.author.id):
+                await ctx.send(
+                    f"⏳ {ctx.author.mention} 少し待ってね！（あと {error.retry_after:.1f} 秒）",
+                    delete_after=max(error.retry_after, 3.0),
+                )
+            return
+        await super().on_command_error(ctx, error)
+
+    async def close(self):
+        await super().close()
+        # 共有の HTTP セッションと計算用のプロセスは Bot の終了と一緒に閉じる
+        await http.close()
+        workers.shutdown()
+
+
+bot = GolemBot(command_prefix="!", intents=intents, help_command=None)
+http = HttpClient()
+rate_limiter = RateLimiter()
+outbox = Outbox()
+reply_router = ReplyRouter()
+
+
+@bot.check
+async def rate_limit(ctx):
+    # 全コマンド共通。セーブもメッセージ送信もしないうちに弾く
+    retry_after = rate_limiter.hit(ctx.author.id, ctx.command.qualified_name)
+    if retry_after:
+        raise RateLimited(retry_after)
+    return True
 
 class PaginatorView(View):
     def __init__(self, pages, author_id):
@@ -60,17 +114,51 @@ class PaginatorView(View):
             self.current_page += 1
             await self.update_message(interaction)
 
+class TradeConfirmView(View):
+    """トレードを受け取る側の「受け取る / 断る」ボタン。押された結果はトレードの返事待ち（Waiter）に渡す。"""
+
+    def __init__(self, waiter, receiver_id):
+        super().__init__(timeout=None)  # 時間切れは reply_router 側で見る
+        self.waiter = waiter
+        self.receiver_id = receiver_id
+
+    async def answer(self, interaction, accepted):
+        if interaction.user.id != self.receiver_id:
+            await interaction.response.send_message("あなたのボタンではありません。", ephemeral=True)
+            return
+        if not self.waiter.resolve(accepted):
+            await interaction.response.send_message("このトレードはもう終わっています。", ephemeral=True)
+            return
+        self.finish()
+        await interaction.response.edit_message(view=self)
+
+    def finish(self):
+        for item in self.children:
+            item.disabled = True
+        self.stop()
+
+    @discord.ui.button(label="受け取る", style=discord.ButtonStyle.success)
+    async def accept(self, interaction: discord.Interaction, button: Button):
+        await self.answer(interaction, True)
+
+    @discord.ui.button(label="断る", style=discord.ButtonStyle.danger)
+    async def decline(self, interaction: discord.Interaction, button: Button):
+        await self.answer(interaction, False)
+
+MAX_MINE_BATCH = 100  # !mine N の上限
+
 GRID_SIZE = 5
 NUM_MINES = 5
 
-ROWS = 6
-COLUMNS = 7
 
 DIFFICULTY = {
-    "easy": (5, 5, 3),     # 行, 列, 爆弾数
-    "normal": (7, 7, 10),
+    "easy": (5, 4, 3),     # 横, 縦, 爆弾数（ボタンは最大5列×5行なので、最後の1行は旗モードの切り替え用）
+    "normal": (7, 7, 10),  # normal / hard / custom はボタンに収まらないので文字の盤面（!dig / !flag）
     "hard": (9, 9, 20)
 }
+BUTTON_MODES = {"easy"}
+TEXT_GAME_TIMEOUT = 1800  # 秒。これだけ操作のない文字盤面のゲームは片付ける
+TEXT_GAME_RESERVE = 200   # 盤面の上に付ける見出しの文字数ぶん
 EMOJIS = {
     None: "⚪",
     0: "🔴",  # プレイヤー1
@@ -82,23 +170,10 @@ PLAYER = "⭕"
 CPU = "❌"
 EMPTY = "⬜"
 
-# 安全に評価する辞書
-safe_dict = {
-    "sin": math.sin,
-    "cos": math.cos,
-    "tan": math.tan,
-    "log": math.log10,
-    "ln": math.log,
-    "sqrt": math.sqrt,
-    "pi": math.pi,
-    "e": math.e,
-    "__builtins__": {}
-}
-
 
 DATA_FILE = "player_data.json"
 player_data = defaultdict(lambda: {
-    "inventory": [],
+    "inventory": {},
     "hp": 100,
     "max_hp": 100,
     "level": 1,
@@ -112,7 +187,7 @@ player_data = defaultdict(lambda: {
 })
 def ensure_player_defaults(user_id):
     defaults = {
-        "inventory": [],
+        "inventory": {},
         "level": 1,
         "exp": 0,
         "hp": 100,
@@ -132,30 +207,6 @@ def ensure_player_defaults(user_id):
             if key not in player_data[user_id]:
                 player_data[user_id][key] = value
 
-# CPU AIロジック
-def get_best_move(board: list[str]) -> int:
-    win_combos = [
-        [0,1,2],[3,4,5],[6,7,8],
-        [0,3,6],[1,4,7],[2,5,8],
-        [0,4,8],[2,4,6]
-    ]
-    for symbol in [CPU, PLAYER]:
-        for combo in win_combos:
-            values = [board[i] for i in combo]
-            if values.count(symbol) == 2 and values.count(EMPTY) == 1:
-                return combo[values.index(EMPTY)]
-    empty_cells = [i for i, v in enumerate(board) if v == EMPTY]
-    return random.choice(empty_cells) if empty_cells else -1
-
-# 勝敗チェック
-def check_winner(board: list[str], symbol: str) -> bool:
-    win_combos = [
-        [0,1,2],[3,4,5],[6,7,8],
-        [0,3,6],[1,4,7],[2,5,8],
-        [0,4,8],[2,4,6]
-    ]
-    return any(all(board[i] == symbol for i in combo) for combo in win_combos)
-
 class TicTacToeButton(Button):
     def __init__(self, index: int, game):
         super().__init__(style=discord.ButtonStyle.secondary, label=EMPTY, row=index // 3, custom_id=str(index))
@@ -163,39 +214,39 @@ class TicTacToeButton(Button):
         self.game = game
 
     async def callback(self, interaction: discord.Interaction):
-        if self.game.board[self.index] != EMPTY:
+        board = self.game.board
+        if not board.is_free(self.index):
             return await interaction.response.send_message("そのマスはすでに埋まっています！", ephemeral=True)
 
         # プレイヤーの手
-        self.game.board[self.index] = PLAYER
+        board.play(self.index, 0)
         self.label = PLAYER
         self.disabled = True
 
         # 勝敗チェック（プレイヤー）
-        if check_winner(self.game.board, PLAYER):
+        if board.is_win(0):
             await self.game.update_view(interaction, end_message="🎉 あなたの勝ち！")
             return
 
         # 引き分けチェック
-        if EMPTY not in self.game.board:
+        if board.is_full():
             await self.game.update_view(interaction, end_message="🤝 引き分けです！")
             return
 
         # CPUの手
-        cpu_move = get_best_move(self.game.board)
-        if cpu_move != -1:
-            self.game.board[cpu_move] = CPU
-            cpu_button = self.game.buttons[cpu_move]
-            cpu_button.label = CPU
-            cpu_button.disabled = True
-
-            # 勝敗チェック（CPU）
-            if check_winner(self.game.board, CPU):
-                await self.game.update_view(interaction, end_message="💻 CPUの勝ち！")
-                return
+        cpu_move = board.cpu_move()
+        board.play(cpu_move, 1)
+        cpu_button = self.game.buttons[cpu_move]
+        cpu_button.label = CPU
+        cpu_button.disabled = True
+
+        # 勝敗チェック（CPU）
+        if board.is_win(1):
+            await self.game.update_view(interaction, end_message="💻 CPUの勝ち！")
+            return
 
         # 引き分け再チェック
-        if EMPTY not in self.game.board:
+        if board.is_full():
             await self.game.update_view(interaction, end_message="🤝 引き分けです！")
             return
 
@@ -203,9 +254,9 @@ class TicTacToeButton(Button):
         await interaction.response.edit_message(view=self.game)
 
 class TicTacToeGame(View):
-    def __init__(self):
+    def __init__(self, difficulty="greedy"):
         super().__init__(timeout=None)
-        self.board = [EMPTY] * 9
+        self.board = TicTacToe(difficulty)
         self.buttons = [TicTacToeButton(i, self) for i in range(9)]
         for btn in self.buttons:
             self.add_item(btn)
@@ -215,47 +266,6 @@ class TicTacToeGame(View):
             btn.disabled = True
         await interaction.response.edit_message(content=end_message, view=self)
 
-WEAPONS = {
-    "素手": {"attack": (5, 10), "defense": 0},
-    "剣": {"attack": (20, 40), "defense": 0},
-    "盾": {"attack": (0, 0), "defense": 20},
-    "弓矢": {"attack": (15, 30), "defense": 0},
-    "TNT": {"attack": (30, 50), "defense": 0},
-    "呪いの魔法": {"attack": (25, 45), "defense": 0},
-    "トライデント": {"attack": (18, 35), "defense": 0},
-    "メイス": {"attack": (22, 38), "defense": 0},
-    "ハンマー": {"attack": (26, 42), "defense": 0},
-    "サイス": {"attack": (24, 44), "defense": 0},
-    "投げナイフ": {"attack": (10, 20), "defense": 0},
-    "クロスボウ": {"attack": (17, 29), "defense": 0}
-}
-
-RARITY = {
-    "common": ["石", "丸石", "木材", "パン", "焼き豚"],
-    "uncommon": ["鉄", "金", "レッドストーン", "スイカ", "ケーキ", "盾"],
-    "rare": ["ダイヤモンド", "エメラルド", "ネザークォーツ", "金のリンゴ", "剣", "弓矢", "メイス"],
-    "epic": ["TNT", "呪いの魔法", "トライデント", "回復薬", "クロスボウ"],
-    "legendary": ["ハンマー", "サイス"]
-}
-
-BUILDING_REWARDS = {
-    "小屋": {"ゴールド": 2},
-    "見張り塔": {"エメラルド": 1},
-    "城": {"ダイヤモンド": 2},
-    "農場": {"ゴールド": 3},
-    "砦": {"ダイヤモンド": 1, "エメラルド": 1}
-}
-
-MODE_PHRASES = {
-    "猫": lambda s: s + "にゃん♪",
-    "お嬢様": lambda s: "わたくし、" + s + "でございますわ。",
-    "中二病": lambda s: s.replace("です", "なのだ").replace("ます", "なのだ"),
-    "執事": lambda s: "かしこまりました。" + s,
-    "幼女": lambda s: s.replace("です", "だよ").replace("ます", "だよ"),
-    "ロボ": lambda s: s.replace("です", "デス").replace("ます", "デス"),
-    "さくらみこ": lambda s: s + "みこ～"
-}
-
 fake_responses = [
     "🟩 本当っぽいね…",
     "🟥 嘘くさいかも。",
@@ -282,87 +292,88 @@ ojisan_lines = [
 
 DATA_FILE = "game_data.json"
 
-def load_data():
-    if not os.path.exists(DATA_FILE):
-        return
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        for user_id, pdata in data.get("player_data", {}).items():
-            player_data[user_id] = pdata
-
-def save_data():
-    data = {
-        "player_data": dict(player_data)
-    }
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+# 変更はすぐに書かず、まとめて保存する（storage.py）
+# STORAGE_BACKEND=sqlite なら game_data.db（`python storage.py import` で移行）
+# STORAGE_BACKEND=journal なら変更を game_data.journal に追記していく
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+if STORAGE_BACKEND == "sqlite":
+    # SQLite なら必要になったプレイヤーだけ読み込む（最近使った人だけメモリに置く）
+    player_data = LazyPlayers(player_data.default_factory)
+    store = PlayerStore(player_data, SqliteBackend(DB_FILE))
+elif STORAGE_BACKEND == "journal":
+    store = PlayerStore(player_data, JournalBackend(DATA_FILE, JOURNAL_FILE))
+else:
+    store = PlayerStore(player_data, JsonBackend(DATA_FILE))
+
+# await をまたいでプレイヤーを書き換えるコマンド用のロック
+player_locks = PlayerLocks()
+loop_lag = LoopLagMonitor()
+
+# 登録名 → user_id の索引（!attack <名前> や !register の重複チェック用）
+name_index = NameIndex()
+store.listeners.append(name_index.update)
+# ランキング（!ranking）も変更のたびに少しずつ並べ替える
+rankings = Rankings()
+store.listeners.append(rankings.update)
+speech_modes = SpeechModes()
+store.listeners.append(speech_modes.update)
 
-
-async def geocode(city_name):
-    url = "https://nominatim.openstreetmap.org/search"
-    params = {
-        "q": city_name,
-        "format": "json",
-        "limit": 1,
-    }
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params=params) as resp:
-            if resp.status != 200:
-                return None
-            data = await resp.json()
-            if len(data) == 0:
-                return None
-            lat = data[0]["lat"]
-            lon = data[0]["lon"]
-            return float(lat), float(lon)
+def load_data():
+    store.load()
+    name_index.build(store.player_names())
+    rankings.build(store.player_scores())
+    speech_modes.build(store.player_modes())
+    print(f"📂 プレイヤーデータ読み込み: {store.load_time * 1000:.1f} ms（{len(player_data)} 人, {STORAGE_BACKEND}）")
 
 
 class Connect4View(View):
     def __init__(self, player1, player2):
         super().__init__(timeout=None)
-        self.players = [player1, player2]
+        self.players = [player1, player2]  # player2 が None なら CPU
         self.turn = 0
-        self.board = [[None for _ in range(COLUMNS)] for _ in range(ROWS)]
+        self.game = Connect4()
         self.message = None
         self.finished = False
+        self.thinking = False
 
         for col in range(COLUMNS):
             self.add_item(Connect4Button(col))
 
+    @property
+    def vs_cpu(self):
+        return self.players[1] is None
+
+    def player_label(self, index):
+        player = self.players[index]
+        return "🤖 CPU" if player is None else player.mention
+
     async def update_board(self):
         display = ""
-        for row in self.board:
+        for row in self.game.rows():
             display += "".join(EMOJIS[cell] for cell in row) + "\n"
         return display
 
-    def drop_piece(self, col, player_index):
-        for row in reversed(range(ROWS)):
-            if self.board[row][col] is None:
-                self.board[row][col] = player_index
-                return row, col
-        return None
-
-    def check_winner(self, last_row, last_col, player_index):
-        directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
-
-        for dx, dy in directions:
-            count = 1
+    def finish(self):
+        self.finished = True
+        for child in self.children:
+            child.disabled = True
 
-            for dir in [1, -1]:
-                x, y = last_col, last_row
-                while True:
-                    x += dx * dir
-                    y += dy * dir
-                    if 0 <= x < COLUMNS and 0 <= y < ROWS and self.board[y][x] == player_index:
-                        count += 1
-                    else:
-                        break
-            if count >= 4:
-                return True
-        return False
+    def result_text(self, player_index):
+        """player_index が打った直後の決着の文言。続くなら None。"""
+        if self.game.is_win(player_index):
+            self.finish()
+            return f"🎉 {self.player_label(player_index)} の勝ち！"
+        if self.game.is_full():
+            self.finish()
+            return "🤝 引き分けです！"
+        return None
 
-    def board_full(self):
-        return all(self.board[0][col] is not None for col in range(COLUMNS))
+    async def cpu_move(self):
+        # 読みは別プロセスで（ほかのゲームやコマンドを止めない）
+        game = self.game
+        col = await workers.run_in_process(best_move, game.bits[1], game.mask, game.moves)
+        game.play(col, 1)
+        return self.result_text(1)
 
 
 class Connect4Button(Button):
@@ -374,32 +385,35 @@ class Connect4Button(Button):
         view: Connect4View = self.view
         if view.finished:
             return await interaction.response.send_message("このゲームはすでに終了しています。", ephemeral=True)
+        if view.thinking:
+            return await interaction.response.send_message("CPU が考え中です…", ephemeral=True)
 
         current_player = view.players[view.turn]
         if interaction.user != current_player:
             return await interaction.response.send_message("あなたの番ではありません！", ephemeral=True)
 
-        move = view.drop_piece(self.column, view.turn)
-        if move is None:
+        if not view.game.play(self.column, view.turn):
             return await interaction.response.send_message("この列はもう埋まっています！", ephemeral=True)
 
-        last_row, last_col = move
-        if view.check_winner(last_row, last_col, view.turn):
+        result = view.result_text(view.turn)
+        if result is None and view.vs_cpu:
+            view.thinking = True
             board_display = await view.update_board()
-            view.finished = True
-            for child in view.children:
-                child.disabled = True
-            await interaction.response.edit_message(content=f"{board_display}\n🎉 {current_player.mention} の勝ち！", view=view)
-        elif view.board_full():
+            await interaction.response.edit_message(content=f"{board_display}\n🤖 CPU が考え中…", view=view)
+            try:
+                result = await view.cpu_move()
+            finally:
+                view.thinking = False
             board_display = await view.update_board()
-            view.finished = True
-            for child in view.children:
-                child.disabled = True
-            await interaction.response.edit_message(content=f"{board_display}\n🤝 引き分けです！", view=view)
-        else:
+            content = f"{board_display}\n{result or f'{current_player.mention} の番です！'}"
+            await interaction.edit_original_response(content=content, view=view)
+            return
+
+        board_display = await view.update_board()
+        if result is None:
             view.turn = 1 - view.turn
-            board_display = await view.update_board()
-            await interaction.response.edit_message(content=f"{board_display}\n{view.players[view.turn].mention} の番です！", view=view)
+            result = f"{view.player_label(view.turn)} の番です！"
+        await interaction.response.edit_message(content=f"{board_display}\n{result}", view=view)
 
 @bot.command(name="桜よ舞い降りろ")
 async def sakura(ctx):
@@ -466,14 +480,21 @@ async def crane_game(ctx):
     await ctx.send("🎮 クレーンゲームを始めよう！", view=view)
     
 @bot.command()
-async def connect4(ctx, opponent: discord.Member):
-    """2人用のConnect4（四目並べ）ゲームを開始します。"""
-    if opponent.bot:
-        return await ctx.send("Botとは対戦できません。")
+async def connect4(ctx, *, opponent: str):
+    """Connect4（四目並べ）ゲームを開始します。`!connect4 @相手` で2人対戦、`!connect4 cpu` で CPU と対戦。"""
+    if opponent.lower() == "cpu":
+        member = None
+    else:
+        try:
+            member = await commands.MemberConverter().convert(ctx, opponent)
+        except commands.MemberNotFound:
+            return await ctx.send("対戦相手が見つかりません。`!connect4 @相手` か `!connect4 cpu` で始めてね。")
+        if member.bot:
+            return await ctx.send("Botとは対戦できません。")
 
-    view = Connect4View(ctx.author, opponent)
+    view = Connect4View(ctx.author, member)
     board_display = await view.update_board()
-    await ctx.send(f"{board_display}\n{ctx.author.mention} vs {opponent.mention}\n{ctx.author.mention} の番です！", view=view)
+    await ctx.send(f"{board_display}\n{ctx.author.mention} vs {view.player_label(1)}\n{ctx.author.mention} の番です！", view=view)
 
 @bot.command(name="犬ちゃん大放出")
 async def dogs(ctx):
@@ -548,15 +569,6 @@ async def yuta(ctx):
 
 
 
-def safe_eval(expr):
-    try:
-        expr = expr.replace("^", "**")  # "^" を pythonの "**" に変換
-        result = eval(expr, {"__builtins__": None}, allowed_names)
-        return str(result)
-    except Exception as e:
-        return f"⚠️ Error: {e}"
-
-
 class CalculatorView(View):
     def __init__(self):
         super().__init__(timeout=180)
@@ -587,10 +599,8 @@ class CalcButton(Button):
 
         if label == "=":
             try:
-                expr = view.expression.replace("√", "sqrt")
-                result = eval(expr, safe_dict)
-                view.expression = str(result)
-            except Exception:
+                view.expression = await calculate(view.expression)
+            except CalcError:
                 view.expression = "Error"
         elif label == "C":
             view.expression = ""
@@ -607,103 +617,255 @@ async def calc(ctx):
     await ctx.send("`0`", view=view)
 
 class CellButton(Button):
-    def __init__(self, x, y, is_bomb, view):
+    def __init__(self, x, y, view):
         super().__init__(label="⬛", style=discord.ButtonStyle.secondary, row=y)
         self.x = x
         self.y = y
-        self.is_bomb = is_bomb
-        self.revealed = False
-        self.flagged = False
+        self.index = view.field.index(x, y)
 
     async def callback(self, interaction: discord.Interaction):
-        if interaction.user != self.view.author:
+        view: MinesweeperView = self.view
+        if interaction.user != view.author:
             await interaction.response.send_message("これはあなたのゲームではありません。", ephemeral=True)
             return
 
-        if self.revealed:
+        field = view.field
+        if field.revealed[self.index]:
             return
 
-        if self.flagged:
-            self.flagged = False
-            self.label = "⬛"
-            await interaction.response.edit_message(view=self.view)
+        if view.flag_mode:
+            self.label = "🚩" if field.toggle_flag(self.index) else "⬛"
+            await interaction.response.edit_message(view=view)
             return
-
-        if interaction.data.get("custom_id", "").endswith("_flag"):
-            self.flagged = True
-            self.label = "🚩"
-            await interaction.response.edit_message(view=self.view)
+        if field.flagged[self.index]:
+            await interaction.response.send_message("旗を立てたマスです。旗モードで外してから開けてね。", ephemeral=True)
             return
 
-        self.revealed = True
-        if self.is_bomb:
-            self.label = "💣"
+        exploded, opened = field.reveal(self.index)
+        if exploded:
+            view.show_mines("💣")
             self.style = discord.ButtonStyle.danger
-            await interaction.response.edit_message(content="💥 爆発しました！ゲームオーバー。", view=self.view)
-            self.view.disable_all()
-        else:
-            count = self.view.count_adjacent_bombs(self.x, self.y)
-            self.label = str(count) if count > 0 else " "
-            self.style = discord.ButtonStyle.success
-            await interaction.response.edit_message(view=self.view)
-            self.view.check_win()
+            view.disable_all()
+            await interaction.response.edit_message(content="💥 爆発しました！ゲームオーバー。", view=view)
+            return
+
+        for i in opened:
+            view.show_count(i)
+        if field.won:
+            view.show_mines("🚩")
+            view.disable_all()
+            await interaction.response.edit_message(content="🎉 クリア！すべての安全なマスを開けました！", view=view)
+            return
+        await interaction.response.edit_message(view=view)
+
+
+class FlagModeButton(Button):
+    def __init__(self, row):
+        super().__init__(label="🚩 旗モード: OFF", style=discord.ButtonStyle.primary, row=row)
+
+    async def callback(self, interaction: discord.Interaction):
+        view: MinesweeperView = self.view
+        if interaction.user != view.author:
+            await interaction.response.send_message("これはあなたのゲームではありません。", ephemeral=True)
+            return
+        view.flag_mode = not view.flag_mode
+        self.label = f"🚩 旗モード: {'ON' if view.flag_mode else 'OFF'}"
+        self.style = discord.ButtonStyle.danger if view.flag_mode else discord.ButtonStyle.primary
+        await interaction.response.edit_message(view=view)
 
 
 class MinesweeperView(View):
     def __init__(self, width, height, bombs, author):
         super().__init__(timeout=300)
         self.author = author
-        self.width = width
-        self.height = height
-        self.bombs = bombs
-        self.cells = {}
+        self.field = Minefield(width, height, bombs)
+        self.flag_mode = False
+        self.cells = []
 
-        # 爆弾配置
-        bomb_positions = random.sample(range(width * height), bombs)
         for y in range(height):
             for x in range(width):
-                idx = y * width + x
-                is_bomb = idx in bomb_positions
-                button = CellButton(x, y, is_bomb, self)
-                self.cells[(x, y)] = button
+                button = CellButton(x, y, self)
+                self.cells.append(button)
                 self.add_item(button)
+        self.add_item(FlagModeButton(row=height))
+
+    def show_count(self, index):
+        count = self.field.counts[index]
+        button = self.cells[index]
+        button.label = str(count) if count > 0 else " "
+        button.style = discord.ButtonStyle.success
 
-    def get_neighbors(self, x, y):
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                if dx == 0 and dy == 0:
-                    continue
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < self.width and 0 <= ny < self.height:
-                    yield self.cells[(nx, ny)]
-
-    def count_adjacent_bombs(self, x, y):
-        return sum(1 for neighbor in self.get_neighbors(x, y) if neighbor.is_bomb)
-
-    def check_win(self):
-        unrevealed = [b for b in self.children if isinstance(b, CellButton) and not b.revealed and not b.is_bomb]
-        if not unrevealed:
-            for b in self.children:
-                if isinstance(b, CellButton) and b.is_bomb:
-                    b.label = "🚩"
-                    b.style = discord.ButtonStyle.success
-            self.disable_all()
+    def show_mines(self, label):
+        for i, button in enumerate(self.cells):
+            if self.field.is_mine(i):
+                button.label = label
+                button.style = discord.ButtonStyle.success if label == "🚩" else discord.ButtonStyle.secondary
 
     def disable_all(self):
         for b in self.children:
-            if isinstance(b, CellButton):
-                b.disabled = True
+            b.disabled = True
+
+
+class TextMinesweeperGame:
+    """!dig / !flag で遊ぶ大きい盤面。持っているのは Minefield の小さな配列と表示用の行だけ。"""
+
+    def __init__(self, width, height, bombs, author, title):
+        self.board = TextBoard(Minefield(width, height, bombs))
+        self.author = author
+        self.title = title
+        self.message = None
+        self.touched = asyncio.get_running_loop().time()
+        self.lock = asyncio.Lock()  # 最初の1手で盤面を作っている間に次の手が来ても順番に処理する
+        self.lucky = False          # 運に頼らず解ける盤面が時間内に見つからなかった
+
+    def content(self, status):
+        return f"{self.title}\n{status}\n{self.board.render()}"
+
+
+text_minesweeper = {}  # (channel_id, author_id) → TextMinesweeperGame
+
+
+def prune_text_minesweeper():
+    now = asyncio.get_running_loop().time()
+    for key, game in list(text_minesweeper.items()):
+        if now - game.touched > TEXT_GAME_TIMEOUT:
+            del text_minesweeper[key]
+
+
+def cell_name(field, index):
+    y, x = divmod(index, field.width)
+    return f"{chr(ord('A') + y)}{x + 1}"
+
+
+async def text_minesweeper_hint(ctx):
+    game = text_minesweeper.get((ctx.channel.id, ctx.author.id))
+    if game is None:
+        await ctx.send("ヒントは `!tntgame normal` などの文字の盤面で遊んでいるときに使えます。")
+        return
+    field = game.board.field
+    # 別プロセスには見えている情報だけを渡す（爆弾の位置は渡さない）
+    index, chance, certain, mines = await workers.run_in_process(
+        hint, field.width, field.height, board_view(field), field.bombs, HINT_TIME,
+    )
+    if index is None:
+        await ctx.send("開けられるマスが見つかりませんでした。")
+        return
+    if certain:
+        text = f"💡 {cell_name(field, index)} は確実に安全です。"
+    else:
+        text = f"💡 {cell_name(field, index)} がいちばん安全そうです（爆弾の確率 {chance:.0%}）。"
+    unflagged = [i for i in mines if not field.flagged[i]]
+    if unflagged:
+        names = ", ".join(cell_name(field, i) for i in unflagged[:10])
+        text += f"\n🚩 確実に爆弾: {names}" + (" …" if len(unflagged) > 10 else "")
+    await ctx.send(text)
 
 
 @bot.command()
-async def tntgame(ctx, mode="easy"):
-    if mode not in DIFFICULTY:
-        await ctx.send("難易度は easy, normal, hard のいずれかです。")
+async def tntgame(ctx, mode="easy", width: int = None, height: int = None, bombs: int = None):
+    if mode == "hint":
+        await text_minesweeper_hint(ctx)
         return
+    if mode == "custom":
+        if None in (width, height, bombs):
+            await ctx.send("使い方: `!tntgame custom 横 縦 爆弾数`（例: `!tntgame custom 30 16 99`）")
+            return
+        if width < 2 or height < 2 or not TextBoard.fits(width, height, TEXT_GAME_RESERVE):
+            await ctx.send("その大きさの盤面は1通のメッセージに収まりません。（例: 横30×縦16まで）")
+            return
+        if not 0 < bombs < width * height:
+            await ctx.send(f"爆弾の数は 1〜{width * height - 1} 個にしてね。")
+            return
+    elif mode in DIFFICULTY:
+        width, height, bombs = DIFFICULTY[mode]
+    else:
+        await ctx.send("難易度は easy, normal, hard, custom のいずれかです。（遊んでいる途中なら hint でヒント）")
+        return
+
+    if mode in BUTTON_MODES:
+        view = MinesweeperView(width, height, bombs, ctx.author)
+        await ctx.send(f"🧨 マインスイーパー（{mode}モード）を始めます！クリックして爆弾を避けよう。", view=view)
+        return
+
+    prune_text_minesweeper()
+    title = f"🧨 マインスイーパー（{mode}モード: {width}×{height}・爆弾{bombs}個）{ctx.author.mention}"
+    game = TextMinesweeperGame(width, height, bombs, ctx.author, title)
+    text_minesweeper[(ctx.channel.id, ctx.author.id)] = game
+    game.message = await ctx.send(game.content("`!dig B7` で開ける / `!flag C3` で旗（行は英字・列は数字）/ `!tntgame hint` でヒント"))
+
+
+async def text_minesweeper_move(ctx, coordinate, flag):
+    game = text_minesweeper.get((ctx.channel.id, ctx.author.id))
+    if game is None:
+        await ctx.send("このチャンネルで遊んでいるマインスイーパーがありません。`!tntgame normal` などで始めてね。")
+        return
+    index = game.board.parse(coordinate)
+    if index is None:
+        await ctx.send("マスは `B7` のように「行の英字 + 列の数字」で指定してね。")
+        return
+
+    async with game.lock:
+        await text_minesweeper_play(ctx, game, index, coordinate, flag)
+
+
+async def text_minesweeper_play(ctx, game, index, coordinate, flag):
+    if game.board.game_over:
+        return  # 待っている間に決着がついた
+    game.touched = asyncio.get_running_loop().time()
+    field = game.board.field
+    if flag:
+        if field.revealed[index]:
+            return
+        placed = field.toggle_flag(index)
+        game.board.update([index])
+        status = f"🚩 {coordinate.strip()} に旗を立てました。" if placed else f"{coordinate.strip()} の旗を外しました。"
+    else:
+        if field.flagged[index]:
+            await ctx.send("旗を立てたマスです。`!flag` で外してから開けてね。")
+            return
+        if field.mines is None:
+            # 最初の1手: 運に頼らず最後まで解ける配置を別プロセスで探す
+            positions, _ = await workers.run_in_process(
+                generate_solvable, field.width, field.height, field.bombs, index, GENERATE_TIME,
+            )
+            if positions is None:
+                game.lucky = True
+                field.place(index)
+            else:
+                field.set_mines(positions)
+        exploded, opened = field.reveal(index)
+        if not opened:
+            return
+        if exploded:
+            game.board.finish()
+            status = "💥 爆発しました！ゲームオーバー。"
+        elif field.won:
+            game.board.finish()
+            status = "🎉 クリア！すべての安全なマスを開けました！"
+        else:
+            game.board.update(opened)
+            status = f"残りの安全なマス: {field.safe_left}"
+            if game.lucky:
+                status += "（この盤面は運が必要かも）"
+    key = (ctx.channel.id, ctx.author.id)
+    if game.board.game_over and text_minesweeper.get(key) is game:
+        del text_minesweeper[key]
+
+    try:
+        await game.message.edit(content=game.content(status))
+    except discord.NotFound:
+        # 盤面のメッセージが消されていたら出し直す
+        game.message = await ctx.send(game.content(status))
+
+
+@bot.command()
+async def dig(ctx, *, coordinate: str):
+    await text_minesweeper_move(ctx, coordinate, flag=False)
 
-    width, height, bombs = DIFFICULTY[mode]
-    view = MinesweeperView(width, height, bombs, ctx.author)
-    await ctx.send(f"🧨 マインスイーパー（{mode}モード）を始めます！クリックして爆弾を避けよう。", view=view)
+
+@bot.command()
+async def flag(ctx, *, coordinate: str):
+    await text_minesweeper_move(ctx, coordinate, flag=True)
 
 
 class FoodMakerView(View):
@@ -777,7 +939,18 @@ async def speed(ctx):
     msg = await ctx.send("速度測定中…")
     end = time.perf_counter()
     latency = (end - start) * 1000  # ms
-    await msg.edit(content=f"Botの応答速度は約 {latency:.1f} ms です。")
+    avg_lag, p99_lag, max_lag = loop_lag.summary()
+    await msg.edit(content=(
+        f"Botの応答速度は約 {latency:.1f} ms です。\n"
+        f"イベントループの遅れ: 平均 {avg_lag:.1f} ms / 99% {p99_lag:.1f} ms / 最大 {max_lag:.1f} ms\n"
+        f"前回の保存: ループ停止 {store.last_flush_time * 1000:.1f} ms, 書き込み {store.last_write_time * 1000:.1f} ms（別スレッド）\n"
+        + "\n".join(
+            f"{label}キャッシュ: {st['size']} 件, ヒット {st['hits']} / 相乗り {st['coalesced']} / ミス {st['misses']}"
+            f"（ヒット率 {st['hit_rate']:.0%}）"
+            for label, st in (("地名", GEOCODE_CACHE.stats()), ("天気", WEATHER_CACHE.stats()))
+        )
+        + f"\n送信キュー: 受付 {outbox.queued} 件 → 送信 {outbox.sent} 通（429 でやり直し {outbox.retries} 回）"
+    ))
 
 class WatameView(View):
     def __init__(self):
@@ -823,112 +996,79 @@ async def watame(ctx):
     await ctx.send("🍬 綿あめメーカー起動！ボタンを押してふわふわにしよう！", view=view)
 
 @bot.command()
-async def tenki(ctx, *, city: str = None):
-    if city is None:
-        await ctx.send(f"{ctx.author.mention} どの都市の天気を知りたいですか？ 返信してください。")
-
-        def check(m):
-            return m.author == ctx.author and m.channel == ctx.channel
+async def tenki(ctx, *cities: str):
+    if not cities:
+        await ctx.send(f"{ctx.author.mention} どの都市の天気を知りたいですか？ 返信してください。（複数なら「,」で区切る）")
 
         try:
-            msg = await bot.wait_for("message", timeout=30.0, check=check)
-            city = msg.content.strip()
+            msg = await reply_router.wait(ctx.channel.id, ctx.author.id, timeout=30.0)
+            # 返信は「New York」のように空白を含んでも1都市。複数はカンマ・読点で区切る
+            cities = re.split(r"[,、，]", msg.content)
         except asyncio.TimeoutError:
             await ctx.send("時間切れです。コマンドをキャンセルしました。")
             return
 
-    coords = await geocode(city)
-    if not coords:
-        await ctx.send(f"{city} の場所が見つかりませんでした。")
+    # 同じ都市は1回だけ（「New York」のように空白を含む名前は "" で囲む）
+    unique = {}
+    for city in cities:
+        unique.setdefault(normalize_name(city), city.strip())
+    cities = [city for city in unique.values() if city]
+    if not cities:
+        return
+    if len(cities) > MAX_TENKI_CITIES:
+        await ctx.send(f"一度に調べられるのは {MAX_TENKI_CITIES} 都市までです。")
         return
 
-    lat, lon = coords
-    weather_url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "current_weather": "true",
-        "timezone": "Asia/Tokyo",
-    }
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(weather_url, params=params) as resp:
-            if resp.status != 200:
-                await ctx.send("天気情報が取得できませんでした。")
-                return
-            weather_data = await resp.json()
-            current = weather_data.get("current_weather", {})
-            if not current:
-                await ctx.send("現在の天気情報がありません。")
-                return
-
-            temp = current.get("temperature")
-            windspeed = current.get("windspeed")
-            weather_code = current.get("weathercode")
-
-            weather_desc = {
-                0: "晴れ",
-                1: "主に晴れ",
-                2: "部分的に曇り",
-                3: "曇り",
-                45: "霧",
-                48: "凍結霧",
-                51: "弱い霧雨",
-                53: "中程度の霧雨",
-                55: "強い霧雨",
-                56: "凍結弱い霧雨",
-                57: "凍結強い霧雨",
-                61: "弱い雨",
-                63: "中程度の雨",
-                65: "強い雨",
-                66: "凍結弱い雨",
-                67: "凍結強い雨",
-                71: "弱い雪",
-                73: "中程度の雪",
-                75: "強い雪",
-                77: "あられ",
-                80: "弱いにわか雨",
-                81: "中程度のにわか雨",
-                82: "強いにわか雨",
-                85: "弱いにわか雪",
-                86: "強いにわか雪",
-                95: "雷雨",
-                96: "弱い雷雨とあられ",
-                99: "強い雷雨とあられ"
-            }
-
-            desc = weather_desc.get(weather_code, "不明な天気")
-
-            await ctx.send(f"**{city}** の現在の天気:\n気温: {temp}°C\n風速: {windspeed} km/h\n天気: {desc}")
+    # 初めての都市は地名検索を1秒に1件ずつするので、その間は「入力中…」を出しておく
+    async with ctx.typing():
+        results = await lookup_weather(http, cities)
+
+    embed = discord.Embed(title="🌤️ 現在の天気", color=discord.Color.blue())
+    for city, coords, current in results:
+        if coords is None:
+            value = "場所が見つかりませんでした。"
+        elif current is None:
+            value = "天気情報が取得できませんでした。"
+        elif not current:
+            value = "現在の天気情報がありません。"
+        else:
+            desc = WEATHER_DESC.get(current.get("weathercode"), "不明な天気")
+            value = f"天気: {desc}\n気温: {current.get('temperature')}°C\n風速: {current.get('windspeed')} km/h"
+        embed.add_field(name=city, value=value, inline=True)
+    await ctx.send(embed=embed)
 
 
 @bot.command()
-async def mine(ctx):
+async def mine(ctx, count: int = 1):
     user_id = str(ctx.author.id)
     ensure_player_defaults(user_id)
 
-    weighted_items = (
-        RARITY["common"] * 50 +
-        RARITY["uncommon"] * 30 +
-        RARITY["rare"] * 15 +
-        RARITY["epic"] * 4 +
-        RARITY["legendary"] * 1
-    )
-    found_item = random.choice(weighted_items)
-    player_data[user_id]["inventory"].append(found_item)
-
-    gained_xp = random.randint(1, 5)
-    player_data[user_id]["exp"] += gained_xp
+    # !mine N でまとめて採掘（結果のメッセージも保存も1回だけ）
+    count = max(1, min(count, MAX_MINE_BATCH))
+    found = MINE_TABLE.roll_many(count)
+    inv = player_data[user_id]["inventory"]
+    for item, n in found.items():
+        add_item(inv, item, n)
 
-    while player_data[user_id]["exp"] >= 100:
-        player_data[user_id]["exp"] -= 100
-        player_data[user_id]["level"] += 1
-        await ctx.send(f"🎉 {ctx.author.display_name} さん、レベルアップ！ 現在レベル {player_data[user_id]['level']} です！")
+    gained_xp = roll_mine_exp(count)
+    old_level = player_data[user_id]["level"]
+    level, exp = apply_exp(old_level, player_data[user_id]["exp"], gained_xp)
+    player_data[user_id]["level"] = level
+    player_data[user_id]["exp"] = exp
 
-    # 変更を保存
-    save_data()
+    # 変更を記録（まとめて書き出される）
+    store.record("mine", {user_id: {"inv": found, "set": {"exp": exp, "level": level}}})
 
-    await ctx.send(f"{ctx.author.display_name} は {found_item} を採掘しました！（経験値 +{gained_xp}）")
+    if count == 1:
+        (found_item,) = found
+        msg = f"{ctx.author.display_name} は {found_item} を採掘しました！（経験値 +{gained_xp}）"
+    else:
+        items = ", ".join(f"{item} x{n}" for item, n in sorted(found.items(), key=lambda kv: -kv[1]))
+        msg = f"{ctx.author.display_name} は {count} 回採掘しました！（経験値 +{gained_xp}）\n{items}"
+    if level > old_level:
+        msg = f"🎉 {ctx.author.display_name} さん、レベルアップ！ 現在レベル {level} です！\n" + msg
+    # 同じチャンネルで続けて採掘されたら、結果は1通にまとめて送る
+    outbox.send(ctx.channel, msg, REPLY)
 
 @bot.command(name="fake")
 async def fake(ctx, *, message: str):
@@ -936,10 +1076,21 @@ async def fake(ctx, *, message: str):
     await ctx.send(f"💬 「{message}」\n→ {result}")
 
     
+MARUBATU_LEVELS = {
+    "perfect": "つよい（負けない）",
+    "greedy": "ふつう",
+    "random": "よわい",
+}
+
 @bot.command(name="marubatu")
-async def start_marubatu(ctx):
-    game = TicTacToeGame()
-    await ctx.send("⭕ あなた vs ❌ CPU の ○×ゲーム！", view=game)
+async def start_marubatu(ctx, difficulty: str = "greedy"):
+    difficulty = difficulty.lower()
+    if difficulty not in MARUBATU_LEVELS:
+        levels = ", ".join(f"`{key}`（{label}）" for key, label in MARUBATU_LEVELS.items())
+        await ctx.send(f"難しさは {levels} から選んでね。")
+        return
+    game = TicTacToeGame(difficulty)
+    await ctx.send(f"⭕ あなた vs ❌ CPU の ○×ゲーム！（CPU: {MARUBATU_LEVELS[difficulty]}）", view=game)
 
 @bot.command()
 async def spin(ctx):
@@ -961,13 +1112,13 @@ async def spin(ctx):
     if result[1]:
         item = result[1]
         count = result[2] if len(result) > 2 else 1
-        for _ in range(count):
-            player_data[user_id]["inventory"].append(item)
+        add_item(player_data[user_id]["inventory"], item, count)
+        store.record("spin", {user_id: {"inv": {item: count}}})
         message += f" `{item} x{count}` を入手しました！"
     else:
         message += " 何も得られませんでした…"
 
-    await ctx.send(f"{ctx.author.display_name} のルーレット結果：{message}")
+    outbox.send(ctx.channel, f"{ctx.author.display_name} のルーレット結果：{message}", REPLY)
 
 
 
@@ -1033,27 +1184,50 @@ async def trade(ctx, target: discord.Member, *, item_name: str):
     sender_id = str(ctx.author.id)
     receiver_id = str(target.id)
 
-    if sender_id not in player_data or item_name not in player_data[sender_id]["inventory"]:
-        await ctx.send("そのアイテムは持っていません。")
+    if sender_id == receiver_id:
+        await ctx.send("自分自身とはトレードできません。")
         return
 
-    def check(m):
-        return m.author == target and m.content.lower() == "yes"
-
-    await ctx.send(f"{target.mention} さん、{ctx.author.display_name} から `{item_name}` を受け取りますか？（`yes` と送信）")
+    # 返事を待つ間もアイテムを二重に使えないよう、先に送り主から預かっておく
+    escrow = Escrow(player_locks, store, sender_id, item_name)
+    if sender_id not in player_data or not await escrow.hold():
+        await ctx.send("そのアイテムは持っていません。")
+        return
 
+    waiter = reply_router.expect(
+        ctx.channel.id, target.id, timeout=15.0,
+        accept=lambda m: m.content.lower() in ("yes", "no"),
+    )
+    view = TradeConfirmView(waiter, target.id)
+    prompt = None
     try:
-        msg = await bot.wait_for("message", timeout=15.0, check=check)
-        player_data[sender_id]["inventory"].remove(item_name)
-        player_data[receiver_id]["inventory"].append(item_name)
-
-        save_data()
+        prompt = await ctx.send(
+            f"{target.mention} さん、{ctx.author.display_name} から `{item_name}` を受け取りますか？"
+            "（ボタンか `yes` / `no` で返事）",
+            view=view,
+        )
+        reply = await waiter.result()
+        accepted = reply if isinstance(reply, bool) else reply.content.lower() == "yes"
+        if not accepted:
+            await ctx.send(f"🙅 {target.display_name} さんがトレードを断りました。")
+            return
+        await escrow.commit(receiver_id)
 
         await ctx.send(f"✅ トレード成功！{ctx.author.display_name} → {target.display_name} に `{item_name}` を渡しました。")
     except asyncio.TimeoutError:
         await ctx.send("⏳ 時間切れです。トレードはキャンセルされました。")
     except Exception as e:
         await ctx.send(f"トレード中にエラーが発生しました: {e}")
+    finally:
+        waiter.cancel()
+        # 確定しなかったトレードはアイテムを送り主に戻す
+        await escrow.rollback()
+        if prompt is not None and not view.is_finished():
+            view.finish()
+            try:
+                await prompt.edit(view=view)
+            except discord.HTTPException:
+                pass
 
 
 
@@ -1104,14 +1278,8 @@ async def battle(ctx):
     attacker = player_data[attacker_id]
     defender = player_data[defender_id]
 
-    weapon = attacker.get("weapon", "素手")
-    attack_range = WEAPONS.get(weapon, WEAPONS["素手"])["attack"]
-    attack_value = random.randint(*attack_range)
-
-    armor_name = defender.get("armor")
-    defense_value = 0
-    if armor_name and armor_name in WEAPONS:
-        defense_value = WEAPONS[armor_name]["defense"]
+    attack_value = random.randint(*attack_range(attacker.get("weapon", "素手")))
+    defense_value = defense_of(defender.get("armor"))
 
     damage = max(attack_value - defense_value, 0)
     session["hp"][defender_id] -= damage
@@ -1131,18 +1299,10 @@ async def battle(ctx):
 
     await ctx.send(msg)
 
-SHOP_ITEMS = {
-    "回復薬": 10,
-    "剣": 50,
-    "盾": 40,
-    "弓矢": 45,
-    "トライデント": 80,
-}
-
 # プレイヤーデータに「gold」を追加し、デフォルトは100
 def ensure_player_defaults(user_id):
     defaults = {
-        "inventory": [],
+        "inventory": {},
         "level": 1,
         "exp": 0,
         "hp": 100,
@@ -1164,12 +1324,6 @@ def ensure_player_defaults(user_id):
             if key not in player_data[user_id]:
                 player_data[user_id][key] = value
 
-def find_user_id_by_name(name: str):
-    for uid, pdata in player_data.items():
-        if pdata.get("name") == name:
-            return uid
-    return None
-
 @bot.command()
 async def shop(ctx):
     shop_text = "**ショップ商品リスト**\n"
@@ -1188,19 +1342,66 @@ async def buy(ctx, *, item_name: str):
         return
 
     price = SHOP_ITEMS[item_name]
-    gold = player_data[user_id].get("gold", 0)
+
+    # 残高の確認から支払いまでをまとめて行う
+    async with player_locks.hold(user_id):
+        gold = player_data[user_id].get("gold", 0)
+        if gold >= price:
+            player_data[user_id]["gold"] = gold - price
+            add_item(player_data[user_id]["inventory"], item_name)
+
+            # ここで保存！
+            store.record("buy", {user_id: {"inv": {item_name: 1}, "set": {"gold": gold - price}}})
 
     if gold < price:
         await ctx.send(f"ゴールドが足りません。所持ゴールド: {gold}、必要ゴールド: {price}")
         return
 
-    player_data[user_id]["gold"] -= price
-    player_data[user_id]["inventory"].append(item_name)
+    await ctx.send(f"{ctx.author.display_name} は {item_name} を {price} ゴールドで購入しました！ 所持ゴールド: {gold - price}")
+
+
+GACHA_COUNTS = (1, 10, 100)
+RARITY_EMOJI = {"common": "⚪", "uncommon": "🟢", "rare": "🔵", "epic": "🟣", "legendary": "🌟"}
+
+@bot.command()
+async def gacha(ctx, count: int = 1):
+    user_id = str(ctx.author.id)
+    ensure_player_defaults(user_id)
+
+    if count not in GACHA_COUNTS:
+        await ctx.send("ガチャは `!gacha`（1回）, `!gacha 10`, `!gacha 100` のどれかです。")
+        return
 
-    # ここで保存！
-    save_data()
+    price = GACHA_COST * count
+    gold = player_data[user_id].get("gold", 0)
+    if gold < price:
+        await ctx.send(f"ゴールドが足りません。所持ゴールド: {gold}、必要ゴールド: {price}")
+        return
 
-    await ctx.send(f"{ctx.author.display_name} は {item_name} を {price} ゴールドで購入しました！ 所持ゴールド: {player_data[user_id]['gold']}")
+    # まとめて抽選して、インベントリにも1回で入れる
+    pity = dict(player_data[user_id].get("gacha_pity", {}))
+    items, rarities, item_rarity = GACHA.pull(count, pity)
+    inv = player_data[user_id]["inventory"]
+    for item, n in items.items():
+        add_item(inv, item, n)
+    player_data[user_id]["gold"] = gold - price
+    player_data[user_id]["gacha_pity"] = pity
+    store.record("gacha", {user_id: {"inv": items, "set": {"gold": gold - price, "gacha_pity": pity}}})
+
+    summary = " ".join(f"{RARITY_EMOJI[r]}{n}" for r, n in rarities.items() if n)
+    # 同じ名前が別のレアリティにもあるので、名前から引かずに実際に出たレアリティを使う
+    best = sorted(items.items(), key=lambda kv: (-RARITY_ORDER.index(item_rarity[kv[0]]), -kv[1]))
+    lines = [f"{RARITY_EMOJI[item_rarity[item]]} {item} x{n}" for item, n in best[:10]]
+    if len(best) > 10:
+        lines.append(f"…ほか {len(best) - 10} 種類")
+
+    embed = discord.Embed(
+        title=f"🎰 {ctx.author.display_name} のガチャ {count}連",
+        description=summary + "\n\n" + "\n".join(lines),
+        color=discord.Color.gold(),
+    )
+    embed.set_footer(text=f"所持ゴールド: {gold - price}")
+    await ctx.send(embed=embed)
 
 
 QUESTS = [
@@ -1219,7 +1420,8 @@ async def quest(ctx):
 
     if success:
         player_data[user_id]["exp"] += quest["exp"]
-        player_data[user_id]["inventory"].append(quest["reward"])
+        add_item(player_data[user_id]["inventory"], quest["reward"])
+        store.record("quest", {user_id: {"inv": {quest["reward"]: 1}, "set": {"exp": player_data[user_id]["exp"]}}})
         await ctx.send(f"クエスト成功！『{quest['desc']}』\n経験値 +{quest['exp']}, アイテム `{quest['reward']}` を獲得！")
     else:
         await ctx.send(f"クエスト失敗…『{quest['desc']}』次は頑張ろう！")
@@ -1238,7 +1440,7 @@ async def pet(ctx):
         player_data[user_id]["pet"] = {"name": "ゴーレム", "level": 1, "exp": 0}
 
         # ここで保存！
-        save_data()
+        store.record("pet", {user_id: {"set": {"pet": player_data[user_id]["pet"]}}})
 
         await ctx.send(f"{ctx.author.display_name} に新しいペット『ゴーレム』が仲間になりました！")
     else:
@@ -1248,12 +1450,12 @@ async def pet(ctx):
             pet["exp"] -= 100
 
             # ここで保存！
-            save_data()
+            store.record("pet", {user_id: {"set": {"pet": pet}}})
 
             await ctx.send(f"ペット『{pet['name']}』がレベルアップ！現在レベル {pet['level']}！")
         else:
             # ここで保存（expだけ増えたので）
-            save_data()
+            store.record("pet", {user_id: {"set": {"pet": pet}}})
 
             await ctx.send(f"ペット『{pet['name']}』は経験値を {pet['exp']}/100 ためました。")
 
@@ -1269,11 +1471,8 @@ async def inventory(ctx):
 
     inv = player_data[user_id]["inventory"]
 
-    # アイテム数を集計して [(item, count), ...] のリストに
-    counted = {}
-    for item in inv:
-        counted[item] = counted.get(item, 0) + 1
-    counted_items = [f"{item} x{count}" for item, count in counted.items()]
+    # インベントリはもともと {アイテム: 個数} なので集計は不要
+    counted_items = [f"{item} x{count}" for item, count in inv.items()]
 
     # ページに分割（8件ずつ）
     items_per_page = 8
@@ -1293,6 +1492,48 @@ async def inventory(ctx):
 
 
 
+RANKING_TITLES = {"level": ("レベル", "Lv."), "gold": ("ゴールド", "G"), "items": ("アイテム数", "個")}
+RANKING_SIZE = 100      # 表示する上位の人数
+RANKING_PER_PAGE = 10
+
+def display_name_of(user_id):
+    name = name_index.by_user.get(user_id)
+    if name:
+        return name
+    user = bot.get_user(int(user_id))
+    return user.display_name if user else f"ID:{user_id}"
+
+@bot.command()
+async def ranking(ctx, key: str = "level"):
+    if key not in RANKING_TITLES:
+        await ctx.send("ランキングは `!ranking level`, `!ranking gold`, `!ranking items` のどれかです。")
+        return
+
+    board = rankings[key]
+    title, unit = RANKING_TITLES[key]
+    top = board.top(RANKING_SIZE)
+    if not top:
+        await ctx.send("まだランキングに載っているプレイヤーがいません。")
+        return
+
+    my_rank = board.rank(str(ctx.author.id))
+    footer = f"あなたの順位: {my_rank}位 / {len(board)}人" if my_rank else f"参加者 {len(board)}人"
+
+    pages = []
+    page_count = (len(top) + RANKING_PER_PAGE - 1) // RANKING_PER_PAGE
+    for i in range(0, len(top), RANKING_PER_PAGE):
+        lines = [
+            f"**{rank}位** {display_name_of(user_id)} — {score} {unit}"
+            for rank, (user_id, score) in enumerate(top[i:i + RANKING_PER_PAGE], start=i + 1)
+        ]
+        embed = discord.Embed(title=f"🏆 {title}ランキング", description="\n".join(lines), color=discord.Color.gold())
+        embed.set_footer(text=f"{footer}・ページ {i // RANKING_PER_PAGE + 1}/{page_count}")
+        pages.append(embed)
+
+    view = PaginatorView(pages, ctx.author.id)
+    await ctx.send(embed=pages[0], view=view)
+
+
 @bot.command()
 async def level(ctx):
     user_id = str(ctx.author.id)
@@ -1315,12 +1556,14 @@ async def equip(ctx, *, item_name: str):
         await ctx.send(f"{item_name} はインベントリに存在しません。")
         return
     # 装備可能か判定（武器or盾だけ装備可能）
-    if item_name in WEAPONS:
+    if item_name in EQUIP_ARMOR:
+        player_data[user_id]["armor"] = item_name
+        store.record("equip", {user_id: {"set": {"armor": item_name}}})
+        await ctx.send(f"{ctx.author.display_name} は {item_name} を装備しました。")
+    elif item_name in EQUIP_WEAPONS:
         player_data[user_id]["weapon"] = item_name
+        store.record("equip", {user_id: {"set": {"weapon": item_name}}})
         await ctx.send(f"{ctx.author.display_name} は {item_name} を装備しました。")
-    elif item_name == "盾":
-        player_data[user_id]["armor"] = item_name
-        await ctx.send(f"{ctx.author.display_name} は 盾 を装備しました。")
     else:
         await ctx.send(f"{item_name} は装備できません。武器または盾のみ装備可能です。")
 
@@ -1336,8 +1579,8 @@ async def register(ctx, name: str = None):
     if name is None:
         name = ctx.author.display_name
 
-    # 同じ名前が使われていないかチェック
-    if any(p["name"] == name for p in player_data.values()):
+    # 同じ名前が使われていないかチェック（全角/半角・大文字/小文字は区別しない）
+    if name_index.is_taken(name):
         await ctx.send("この名前はすでに使われています。別の名前を選んでください。")
         return
 
@@ -1349,15 +1592,26 @@ async def register(ctx, name: str = None):
         "location": "拠点",
         "mode": "normal"
     }
-    save_data()
+    store.record("register", {user_id: {"set": player_data[user_id]}})
     await ctx.send(f"{name}さんを登録しました！")
 
-# 名前からuser_idを探す
+# 名前からuser_idを探す（索引を引くだけ）
 def find_user_id_by_name(name: str):
-    for user_id, data in player_data.items():
-        if data["name"] == name:
-            return user_id
-    return None
+    return name_index.find(name)
+
+@bot.command()
+async def rename(ctx, name: str):
+    user_id = str(ctx.author.id)
+    if user_id not in player_data:
+        await ctx.send("まずは `!register 名前` で登録してください。")
+        return
+    if name_index.is_taken(name, user_id):
+        await ctx.send("この名前はすでに使われています。別の名前を選んでください。")
+        return
+
+    player_data[user_id]["name"] = name
+    store.record("rename", {user_id: {"set": {"name": name}}})
+    await ctx.send(f"名前を {name} に変更しました！")
 
 # --------------------
 # 🎮 マイクラ風ストーリーゲーム
@@ -1369,10 +1623,11 @@ async def story(ctx, who: str = None):
                "ぷろわん", "まめちー", "うに", "ノックス", "わたあめ", "みこ"]
 
     if not who:
-        if not player_data:
+        names = name_index.names()
+        if not names:
             await ctx.send("プレイヤーが登録されていません。")
             return
-        who = random.choice(list(player_data.values()))["name"]
+        who = random.choice(names)
 
     # プレイヤー絡みの対象は登録済みの中から who を除く
     others = [p for p in players if p != who]
@@ -1481,32 +1736,29 @@ async def attack(ctx, target_input: str = None):
         await ctx.send("相手はまだ登録されていません。")
         return
 
-    attacker = player_data[attacker_id]
-    defender = player_data[target_id]
+    # 相手の生死の確認からダメージまでを、両者のロックを取ってまとめて行う
+    async with player_locks.hold(attacker_id, target_id):
+        attacker = player_data[attacker_id]
+        defender = player_data[target_id]
 
-    if not defender.get("alive", True):
-        await ctx.send(f"{target_name} はすでに倒れています。")
-        return
-
-    weapon = attacker.get("weapon", "素手")
-    attack_range = WEAPONS.get(weapon, WEAPONS["素手"])["attack"]
-    attack_value = random.randint(*attack_range)
+        if not defender.get("alive", True):
+            msg = f"{target_name} はすでに倒れています。"
+        else:
+            attack_value = random.randint(*attack_range(attacker.get("weapon", "素手")))
+            defense_value = defense_of(defender.get("armor"))
 
-    armor_name = defender.get("armor")
-    defense_value = 0
-    if armor_name and armor_name in WEAPONS:
-        defense_value = WEAPONS[armor_name]["defense"]
+            damage = max(attack_value - defense_value, 0)
+            defender["hp"] = max(defender.get("hp", 100) - damage, 0)
 
-    damage = max(attack_value - defense_value, 0)
-    defender["hp"] = max(defender.get("hp", 100) - damage, 0)
+            attacker_name = attacker.get("name", ctx.author.display_name)
+            msg = f"{attacker_name} は {target_name} に {damage} のダメージを与えた！ (残りHP: {defender['hp']})"
 
-    msg = f"{attacker['name']} は {target_name} に {damage} のダメージを与えた！ (残りHP: {defender['hp']})"
+            if defender["hp"] <= 0:
+                defender["alive"] = False
+                msg += f"\n💀 {target_name} は倒れた…"
 
-    if defender["hp"] <= 0:
-        defender["alive"] = False
-        msg += f"\n💀 {target_name} は倒れた…"
+            store.record("attack", {target_id: {"set": {"hp": defender["hp"], "alive": defender.get("alive", True)}}})
 
-    save_data()
     await ctx.send(msg)
 
 
@@ -1518,6 +1770,7 @@ async def back(ctx):
         return
     player_data[user_id]["hp"] = player_data[user_id].get("max_hp", 100)
     player_data[user_id]["alive"] = True
+    store.record("back", {user_id: {"set": {"hp": player_data[user_id]["hp"], "alive": True}}})
     await ctx.send(f"{ctx.author.display_name} は拠点に戻り、HPが全回復しました！")
 
 
@@ -1537,9 +1790,9 @@ async def build(ctx, *, building_name: str):
 
     # インベントリに報酬を付与
     for reward_item, count in rewards.items():
-        for _ in range(count):
-            player_data[user_id]["inventory"].append(reward_item)
+        add_item(player_data[user_id]["inventory"], reward_item, count)
 
+    store.record("build", {user_id: {"inv": dict(rewards)}})
     await ctx.send(f"{ctx.author.display_name} は {building_name} を建築しました！報酬: {', '.join(f'{k} x{v}' for k,v in rewards.items())}")
 
 @bot.command()
@@ -1547,9 +1800,10 @@ async def golem(ctx):
     help_text = (
         "🧱 **Golem ゲームへようこそ！** 🧱\n\n"
         "🎮 **基本コマンド**\n"
-        "・`!mine`：採掘してアイテムと経験値をゲット！⛏️\n"
+        "・`!mine`：採掘してアイテムと経験値をゲット！⛏️（`!mine 10` でまとめて採掘）\n"
         "・`!inventory`：インベントリを確認します。🎒\n"
         "・`!level`：レベルと経験値を表示。⭐\n"
+        "・`!ranking level|gold|items`：ランキングを表示。🏆\n"
         "・`!equip <アイテム名>`：武器や盾を装備。🗡️🛡️\n"
         "・`!attack @ユーザー`：自由に他プレイヤーを攻撃できます。\n"
         "・`!duel @ユーザー` + `!battle`：ターン制の決闘モードでPvP対戦が楽しめます。\n"
@@ -1563,11 +1817,12 @@ async def golem(ctx):
         "・`!quest`：ランダムクエストに挑戦！報酬ゲット！🎯\n"
         "・`!pet`：ペットと一緒に冒険しよう！🐾\n"
         "・`!trade @ユーザー <自分のアイテム> <相手のアイテム>`：アイテム交換機能（準備中）🔄\n"
-        "・`!spin`：ルーレットで運試し！🎰\n\n"
+        "・`!spin`：ルーレットで運試し！🎰\n"
+        "・`!gacha` / `!gacha 10` / `!gacha 100`：ガチャを回そう！🎁\n\n"
         "・`!story`：ストーリー作成できるよ！\n\n"
-        "・`!register`：プレイヤー登録できるよ！\n\n"
+        "・`!register`：プレイヤー登録できるよ！（`!rename` で名前の変更）\n\n"
         "・`!clock`：現在の時間が分かるよ!\n\n"
-        "・`!tenki`：現在の天気が分かるよ!\n\n"
+        "・`!tenki 東京 大阪 …`：現在の天気が分かるよ!（都市を並べるとまとめて調べるよ）\n\n"
         "ゲームの冒険を存分に楽しんでくださいね！"
     )
     await ctx.send(help_text)
@@ -1637,15 +1892,18 @@ async def use_potion(ctx):
     if user_id not in player_data:
         await ctx.send("まずはゲームを始めてください。")
         return
-    potions = player_data[user_id].get("potions", 0)
+    async with player_locks.hold(user_id):
+        potions = player_data[user_id].get("potions", 0)
+        if potions > 0:
+            player_data[user_id]["potions"] = potions - 1
+            player_data[user_id]["hp"] = min(player_data[user_id].get("max_hp", 100), player_data[user_id].get("hp", 100) + 50)
+
+            # ここで保存！
+            store.record("potion", {user_id: {"set": {"potions": potions - 1, "hp": player_data[user_id]["hp"]}}})
+
     if potions <= 0:
         await ctx.send("回復薬がありません！")
         return
-    player_data[user_id]["potions"] = potions - 1
-    player_data[user_id]["hp"] = min(player_data[user_id].get("max_hp", 100), player_data[user_id].get("hp", 100) + 50)
-
-    # ここで保存！
-    save_data()
 
     await ctx.send(f"{ctx.author.display_name} は回復薬を使いHPを回復しました！（現在HP: {player_data[user_id]['hp']}）")
 
@@ -1659,7 +1917,7 @@ async def mode(interaction: discord.Interaction, mode: str):
         return
     if user_id not in player_data:
         player_data[user_id] = {
-            "inventory": [],
+            "inventory": {},
             "level": 1,
             "exp": 0,
             "hp": 100,
@@ -1671,6 +1929,7 @@ async def mode(interaction: discord.Interaction, mode: str):
         }
     else:
         player_data[user_id]["mode"] = mode
+    store.record("mode", {user_id: {"set": {"mode": mode}}})
     await interaction.response.send_message(f"{interaction.user.display_name} の発言モードを {mode} に変更しました！")
 
 
@@ -1679,20 +1938,17 @@ async def on_message(message):
     if message.author.bot:
         return
 
+    reply_router.dispatch(message)  # !tenki・!trade の返事待ち
     await bot.process_commands(message)  # 先にコマンドを処理
 
-    user_id = str(message.author.id)
-    if user_id in player_data:
-        mode = player_data[user_id].get("mode", "平和")
-        func = MODE_PHRASES.get(mode)
-        if func:
-            new_content = func(message.content)
-            if new_content != message.content:
-                try:
-                    await message.delete()
-                    await message.channel.send(f"{message.author.display_name} > {new_content}")
-                except discord.Forbidden:
-                    pass
+    # モードを設定していない人はここで終わり（プレイヤーデータは読まない）
+    if not speech_modes.by_user:
+        return
+    new_content = speech_modes.convert(str(message.author.id), message.content)
+    if new_content is not None:
+        # 削除も投稿し直しも、同じチャンネルの分はまとめて行う（消せなかったら投稿し直さない）
+        if await outbox.delete(message):
+            outbox.send(message.channel, f"{message.author.display_name} > {new_content}")
 
 
 @bot.event
@@ -1700,7 +1956,18 @@ async def on_ready():
     await bot.tree.sync()
     print(f"ログイン完了: {bot.user}")
 
+@bot.event
+async def setup_hook():
+    # 定期保存とイベントループの遅れの計測を開始
+    store.start()
+    loop_lag.start()
+    await http.start()
+
 if __name__ == "__main__":
     load_data()
-    bot.run(TOKEN)
+    try:
+        bot.run(TOKEN)
+    finally:
+        # 終了時に未保存の変更を書き出す
+        store.close()
 
@@ -0,0 +1,78 @@
+# ------------------------------
+# 有効期限つき LRU キャッシュ（非同期の取得処理用）
+#   同じキーの取得が同時に来たら、上流への問い合わせは1回にまとめる
+# ------------------------------
+
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """maxsize 件までの LRU。ttl 秒たった値は使わずに取り直す。
+
+    None は「取れなかった」扱いでキャッシュしない（次の要求でまた取りに行く）。
+    """
+
+    def __init__(self, maxsize, ttl, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # キー → (期限, 値)
+        self.inflight = {}            # キー → 取得中の Task
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # 取得中の要求に相乗りした回数
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= self.clock():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self.entries[key] = (self.clock() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    async def get_or_fetch(self, key, fetch):
+        """キャッシュにあればそれを、なければ fetch() を await した結果を返す。"""
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self.inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.get_running_loop().create_task(self._fetch(key, fetch))
+            self.inflight[key] = task
+        # 待っている1人がキャンセルされても、取得そのものは止めない
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key, fetch):
+        try:
+            value = await fetch()
+            if value is not None:
+                self.set(key, value)
+            return value
+        finally:
+            del self.inflight[key]
+
+    def stats(self):
+        requests = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / requests if requests else 0.0,
+        }
@@ -0,0 +1,198 @@
+# ------------------------------
+# 電卓（!calc）の式の計算
+#   eval は使わず、式を AST にして、許可した演算・関数・定数だけを自分で計算する
+#   式の大きさ・累乗の指数・整数の桁数には上限があり、超えたら計算する前に断る
+#   上限の中でも計算量（大きな整数の掛け算・累乗の桁数の合計）が多い式だけ別プロセスで計算し、
+#   時間切れならプロセスごと止める。結果は式ごとに覚えておく
+# ------------------------------
+
+import ast
+import asyncio
+import math
+import operator
+from collections import namedtuple
+from functools import lru_cache
+
+import workers
+from cache import TTLCache
+
+FUNCTIONS = {
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "log": math.log10,
+    "ln": math.log,
+    "sqrt": math.sqrt,
+}
+CONSTANTS = {
+    "pi": math.pi,
+    "e": math.e,
+}
+BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+UNARY = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+MAX_LENGTH = 500       # 式の文字数
+MAX_NODES = 200        # 式の AST のノード数
+MAX_EXPONENT = 10_000  # 整数の累乗の指数
+MAX_DIGITS = 1000      # 整数の桁数（途中の値も結果も）
+INLINE_WORK = 20_000   # その場で計算する計算量（掛け算・累乗の結果の桁数の合計）。超えたら別プロセス
+TIMEOUT = 1.5          # 別プロセスで計算するときの秒数（ボタンの応答は3秒以内）
+
+RESULT_CACHE = TTLCache(maxsize=1024, ttl=60 * 60)  # 式 → 結果（"=" を何度押しても計算は1回）
+
+LOG10_2 = math.log10(2)
+
+# 計算用の木: ("num", 値) / ("unary", 関数, 子) / ("binary", 関数, 左, 右) / ("call", 関数, 引数)
+Compiled = namedtuple("Compiled", "tree nodes")
+
+
+class CalcError(ValueError):
+    pass
+
+
+class _OverBudget(Exception):
+    pass
+
+
+def normalize(text):
+    """ボタンの記号を Python の式に直す。"""
+    return text.replace("√", "sqrt").replace("^", "**").strip()
+
+
+def _build(node, budget):
+    budget[0] -= 1
+    if budget[0] < 0:
+        raise CalcError("式が長すぎます")
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if type(value) not in (int, float):
+            raise CalcError("数字以外は使えません")
+        if type(value) is int and value.bit_length() * LOG10_2 > MAX_DIGITS:
+            raise CalcError("数が大きすぎます")
+        return ("num", value)
+    if isinstance(node, ast.Name):
+        if node.id not in CONSTANTS:
+            raise CalcError(f"{node.id} は使えません")
+        return ("num", CONSTANTS[node.id])
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY:
+        return ("unary", UNARY[type(node.op)], _build(node.operand, budget))
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY:
+        return ("binary", BINARY[type(node.op)], _build(node.left, budget), _build(node.right, budget))
+    if isinstance(node, ast.Call):
+        if not (isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS):
+            raise CalcError("使えない関数です")
+        if len(node.args) != 1 or node.keywords:
+            raise CalcError(f"{node.func.id} の引数は1つです")
+        return ("call", FUNCTIONS[node.func.id], _build(node.args[0], budget))
+    raise CalcError("使えない書き方です")
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(text):
+    """式の文字列を計算用の木にする（同じ式は2回目から表を引くだけ）。"""
+    text = normalize(text)
+    if not text:
+        raise CalcError("式がありません")
+    if len(text) > MAX_LENGTH:
+        raise CalcError("式が長すぎます")
+    try:
+        tree = ast.parse(text, mode="eval")
+    except (SyntaxError, ValueError):
+        raise CalcError("式が正しくありません") from None
+    budget = [MAX_NODES]
+    tree = _build(tree.body, budget)
+    return Compiled(tree, MAX_NODES - budget[0])
+
+
+def _digits(value):
+    return value.bit_length() * LOG10_2 if type(value) is int else 0
+
+
+def _run(node, work):
+    """node を計算する。work は残りの計算量 [数]（使い切ったら _OverBudget）。"""
+    kind = node[0]
+    if kind == "num":
+        return node[1]
+    if kind == "unary":
+        return node[1](_run(node[2], work))
+    if kind == "call":
+        return node[1](_run(node[2], work))
+
+    func = node[1]
+    left = _run(node[2], work)
+    right = _run(node[3], work)
+    if type(left) is int and type(right) is int:
+        # 掛け算・累乗は結果の桁数を先に見積もって、大きすぎるなら計算しない
+        if func is operator.pow and right > 0 and abs(left) > 1:
+            if right > MAX_EXPONENT:
+                raise CalcError("指数が大きすぎます")
+            estimate = right * math.log10(abs(left))
+        elif func is operator.mul:
+            estimate = _digits(left) + _digits(right)
+        else:
+            # 足し算・引き算・割り算はすぐ終わるので、計算してから結果の桁数を見る
+            result = func(left, right)
+            if _digits(result) > MAX_DIGITS:
+                raise CalcError("数が大きすぎます")
+            return result
+        if estimate > MAX_DIGITS:
+            raise CalcError("数が大きすぎます")
+        work[0] -= estimate
+        if work[0] < 0:
+            raise _OverBudget
+    return func(left, right)
+
+
+def _result(compiled, work):
+    try:
+        result = _run(compiled.tree, [work])
+    except CalcError:
+        raise
+    except ZeroDivisionError:
+        raise CalcError("0 で割れません") from None
+    except OverflowError:
+        raise CalcError("数が大きすぎます") from None
+    except (ValueError, TypeError):
+        raise CalcError("計算できない値です") from None
+    if isinstance(result, complex):
+        raise CalcError("計算できない値です")
+    return str(result)
+
+
+def evaluate(text):
+    """式を計算して、結果の文字列を返す。計算できなければ CalcError。
+
+    別プロセスからも呼ぶので、引数も戻り値もただの文字列にしてある。
+    """
+    return _result(compile_expression(text), math.inf)
+
+
+async def calculate(text):
+    """式を計算する。ふつうの式はその場で、計算量の多い式は別プロセスで TIMEOUT 秒まで。"""
+    compiled = compile_expression(text)
+    return await RESULT_CACHE.get_or_fetch(text, lambda: _calculate(text, compiled))
+
+
+async def _calculate(text, compiled):
+    try:
+        return _result(compiled, INLINE_WORK)
+    except _OverBudget:
+        pass
+    try:
+        return await workers.run_killable(evaluate, text, timeout=TIMEOUT)
+    except asyncio.TimeoutError:
+        raise CalcError("計算に時間がかかりすぎます") from None
+    except RuntimeError:
+        # 別プロセスが結果を返さずに終わった（メモリ不足で止められたなど）
+        raise CalcError("計算できませんでした") from None
@@ -0,0 +1,125 @@
+# ------------------------------
+# アイテムカタログ
+#   全アイテムに通し番号（ID）をつけ、よく使う検索を起動時に表にしておく
+# ------------------------------
+
+import json
+import os
+
+GACHA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gacha_items.json")
+
+RARITY_ORDER = ("common", "uncommon", "rare", "epic", "legendary")
+
+WEAPONS = {
+    "素手": {"attack": (5, 10), "defense": 0},
+    "剣": {"attack": (20, 40), "defense": 0},
+    "盾": {"attack": (0, 0), "defense": 20},
+    "弓矢": {"attack": (15, 30), "defense": 0},
+    "TNT": {"attack": (30, 50), "defense": 0},
+    "呪いの魔法": {"attack": (25, 45), "defense": 0},
+    "トライデント": {"attack": (18, 35), "defense": 0},
+    "メイス": {"attack": (22, 38), "defense": 0},
+    "ハンマー": {"attack": (26, 42), "defense": 0},
+    "サイス": {"attack": (24, 44), "defense": 0},
+    "投げナイフ": {"attack": (10, 20), "defense": 0},
+    "クロスボウ": {"attack": (17, 29), "defense": 0}
+}
+
+# 採掘で出るアイテム
+RARITY = {
+    "common": ["石", "丸石", "木材", "パン", "焼き豚"],
+    "uncommon": ["鉄", "金", "レッドストーン", "スイカ", "ケーキ", "盾"],
+    "rare": ["ダイヤモンド", "エメラルド", "ネザークォーツ", "金のリンゴ", "剣", "弓矢", "メイス"],
+    "epic": ["TNT", "呪いの魔法", "トライデント", "回復薬", "クロスボウ"],
+    "legendary": ["ハンマー", "サイス"]
+}
+
+SHOP_ITEMS = {
+    "回復薬": 10,
+    "剣": 50,
+    "盾": 40,
+    "弓矢": 45,
+    "トライデント": 80,
+}
+
+BUILDING_REWARDS = {
+    "小屋": {"ゴールド": 2},
+    "見張り塔": {"エメラルド": 1},
+    "城": {"ダイヤモンド": 2},
+    "農場": {"ゴールド": 3},
+    "砦": {"ダイヤモンド": 1, "エメラルド": 1}
+}
+
+
+def load_gacha_items(path=GACHA_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        return sorted(json.load(f), key=lambda entry: entry["id"])
+
+
+# ---- ID と索引 ----
+# ITEMS[id] = {"id", "name", "rarity", "attack", "defense", "price", "gacha"}
+ITEMS = []
+ITEM_IDS = {}                                   # 名前 → ID（同名のガチャアイテムは最初のもの）
+RARITY_IDS = {rarity: [] for rarity in RARITY_ORDER}        # 採掘で出るアイテムのID
+GACHA_RARITY_IDS = {rarity: [] for rarity in RARITY_ORDER}  # ガチャで出るアイテムのID
+
+
+def _add_item(name, rarity=None, gacha=False):
+    if not gacha and name in ITEM_IDS:
+        return ITEM_IDS[name]
+    stats = WEAPONS.get(name, {})
+    item = {
+        "id": len(ITEMS),
+        "name": name,
+        "rarity": rarity,
+        "attack": stats.get("attack"),
+        "defense": stats.get("defense", 0),
+        "price": SHOP_ITEMS.get(name),
+        "gacha": gacha,
+    }
+    ITEMS.append(item)
+    ITEM_IDS.setdefault(name, item["id"])
+    return item["id"]
+
+
+for _rarity in RARITY_ORDER:
+    for _name in RARITY[_rarity]:
+        RARITY_IDS[_rarity].append(_add_item(_name, _rarity))
+for _name in list(WEAPONS) + list(SHOP_ITEMS):
+    _add_item(_name)
+for _rewards in BUILDING_REWARDS.values():
+    for _name in _rewards:
+        _add_item(_name)
+for _entry in load_gacha_items():
+    GACHA_RARITY_IDS[_entry["rarity"]].append(_add_item(_entry["name"], _entry["rarity"], gacha=True))
+
+ITEM_NAMES = [item["name"] for item in ITEMS]   # ID → 名前
+
+# 装備できるもの: 攻撃力があれば武器、防御力だけなら防具
+EQUIP_WEAPONS = frozenset(
+    name for name, stats in WEAPONS.items() if stats["attack"][1] > 0 and name != "素手"
+)
+EQUIP_ARMOR = frozenset(
+    name for name, stats in WEAPONS.items() if stats["attack"][1] == 0 and stats["defense"] > 0
+)
+
+
+def get_item(name):
+    item_id = ITEM_IDS.get(name)
+    return ITEMS[item_id] if item_id is not None else None
+
+
+def rarity_of(name):
+    item = get_item(name)
+    return item["rarity"] if item else None
+
+
+def attack_range(weapon):
+    # 知らない武器は素手あつかい
+    return WEAPONS.get(weapon, WEAPONS["素手"])["attack"]
+
+
+def defense_of(armor):
+    if not armor:
+        return 0
+    return WEAPONS.get(armor, {}).get("defense", 0)
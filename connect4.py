@@ -0,0 +1,206 @@
+# ------------------------------
+# Connect4（四目並べ）のビットボードと CPU の思考
+#   盤面は列ごとに 7 ビット（6 マス + 番兵 1 ビット）ずつ並べた整数2つ
+#   ビット番号 = 列 * 7 + 行（行 0 が一番下）
+# ------------------------------
+
+import time
+
+ROWS = 6
+COLUMNS = 7
+STRIDE = ROWS + 1  # 1列あたりのビット数
+CELLS = ROWS * COLUMNS
+
+BOTTOM = sum(1 << (col * STRIDE) for col in range(COLUMNS))  # 各列の一番下
+BOARD_MASK = BOTTOM * ((1 << ROWS) - 1)                      # 番兵を除いた全マス
+COLUMN_ORDER = (3, 2, 4, 1, 5, 0, 6)  # 真ん中の列から試す（枝刈りがよく効く）
+
+WIN = 1000          # 勝ちの点数（早く勝つほど高い: WIN - 手数）
+THINK_TIME = 1.0    # CPU が1手に使う秒数
+TT_SIZE = 1 << 20   # 置換表に覚えておく局面数の上限
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+def column_mask(col):
+    return ((1 << ROWS) - 1) << (col * STRIDE)
+
+
+def is_win(bits):
+    """4つ並んでいれば True（縦 1・横 7・斜め 6 / 8 ずつずらして重ねる）。"""
+    for shift in (1, STRIDE, STRIDE - 1, STRIDE + 1):
+        pairs = bits & (bits >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+class Connect4:
+    """対戦用の盤面。bits[0] / bits[1] がそれぞれのプレイヤーの石。"""
+
+    def __init__(self):
+        self.bits = [0, 0]
+        self.heights = [col * STRIDE for col in range(COLUMNS)]  # 各列で次に石が入るビット
+        self.moves = 0
+
+    @property
+    def mask(self):
+        return self.bits[0] | self.bits[1]
+
+    def can_play(self, col):
+        return self.heights[col] < col * STRIDE + ROWS
+
+    def play(self, col, player):
+        """col に player の石を落とす。列が埋まっていたら False。"""
+        if not self.can_play(col):
+            return False
+        self.bits[player] |= 1 << self.heights[col]
+        self.heights[col] += 1
+        self.moves += 1
+        return True
+
+    def is_win(self, player):
+        return is_win(self.bits[player])
+
+    def is_full(self):
+        return self.moves == CELLS
+
+    def cell(self, row, col):
+        """上から row 行目・左から col 列目の石（None / 0 / 1）。"""
+        bit = 1 << (col * STRIDE + ROWS - 1 - row)
+        if self.bits[0] & bit:
+            return 0
+        if self.bits[1] & bit:
+            return 1
+        return None
+
+    def rows(self):
+        return [[self.cell(row, col) for col in range(COLUMNS)] for row in range(ROWS)]
+
+
+# ------------------------------
+# CPU の思考（ネガマックス + αβ + 置換表 + 反復深化）
+#   current は手番側の石、mask は両者の石
+# ------------------------------
+
+def winning_positions(current, mask):
+    """current があと1つ置けば4つ並ぶ空きマス。"""
+    r = (current << 1) & (current << 2) & (current << 3)
+    for shift in (STRIDE, STRIDE - 1, STRIDE + 1):
+        p = (current << shift) & (current << (2 * shift))
+        r |= p & (current << (3 * shift))
+        r |= p & (current >> shift)
+        p = (current >> shift) & (current >> (2 * shift))
+        r |= p & (current << shift)
+        r |= p & (current >> (3 * shift))
+    return r & (BOARD_MASK ^ mask)
+
+
+def evaluate(current, mask):
+    """深さ切れの局面の点数。あと1つで4つになる空きマスの数の差（真ん中の列の石も少し足す）。"""
+    opponent = current ^ mask
+    center = column_mask(3)
+    return (
+        3 * (winning_positions(current, mask).bit_count() - winning_positions(opponent, mask).bit_count())
+        + (current & center).bit_count() - (opponent & center).bit_count()
+    )
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+class Searcher:
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.table = {}  # current + mask → (深さ, 種類, 点数, 最善の列)
+        self.nodes = 0
+
+    def negamax(self, current, mask, moves, depth, alpha, beta):
+        self.nodes += 1
+        if self.nodes & 1023 == 0 and time.perf_counter() > self.deadline:
+            raise _OutOfTime
+        if moves == CELLS:
+            return 0, None
+
+        possible = (mask + BOTTOM) & BOARD_MASK
+        if winning_positions(current, mask) & possible:
+            return WIN - moves - 1, None  # 次の手で勝てる（列はルートで別に探す）
+        opponent_wins = winning_positions(current ^ mask, mask)
+        forced = possible & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                return -(WIN - moves - 2), None  # 2か所で王手されている
+            possible = forced
+        # 相手の勝ちマスの真下には置かない
+        safe = possible & ~(opponent_wins >> 1)
+        if not safe:
+            return -(WIN - moves - 2), None
+        if depth == 0:
+            return evaluate(current, mask), None
+
+        key = current + mask
+        entry = self.table.get(key)
+        tt_col = None
+        if entry is not None:
+            tt_depth, kind, value, tt_col = entry
+            if tt_depth >= depth:
+                if kind == EXACT:
+                    return value, tt_col
+                if kind == LOWER:
+                    alpha = max(alpha, value)
+                elif kind == UPPER:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value, tt_col
+
+        original_alpha = alpha
+        best, best_col = -WIN * 2, None
+        order = COLUMN_ORDER if tt_col is None else (tt_col,) + tuple(c for c in COLUMN_ORDER if c != tt_col)
+        for col in order:
+            move = safe & column_mask(col)
+            if not move:
+                continue
+            score, _ = self.negamax(current ^ mask, mask | move, moves + 1, depth - 1, -beta, -alpha)
+            score = -score
+            if score > best:
+                best, best_col = score, col
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        kind = UPPER if best <= original_alpha else LOWER if best >= beta else EXACT
+        if len(self.table) >= TT_SIZE:
+            self.table.clear()
+        self.table[key] = (depth, kind, best, best_col)
+        return best, best_col
+
+
+def best_move(current, mask, moves, think_time=THINK_TIME):
+    """手番側（石 current）の一番よい列を返す。think_time 秒まで深さを1ずつ増やして読む。
+
+    別プロセスで呼ばれるので、引数も戻り値もただの整数にしてある。
+    """
+    possible = (mask + BOTTOM) & BOARD_MASK
+    playable = [col for col in COLUMN_ORDER if possible & column_mask(col)]
+    # すぐ勝てるならそこ、相手の勝ちを止める必要があればそこ
+    win_now = winning_positions(current, mask) & possible
+    for col in playable:
+        if win_now & column_mask(col):
+            return col
+    forced = winning_positions(current ^ mask, mask) & possible
+    for col in playable:
+        if forced & column_mask(col):
+            return col
+
+    searcher = Searcher(time.perf_counter() + think_time)
+    best = playable[0]
+    for depth in range(1, CELLS - moves + 1):
+        try:
+            score, col = searcher.negamax(current, mask, moves, depth, -WIN * 2, WIN * 2)
+        except _OutOfTime:
+            break
+        if col is not None:
+            best = col
+        if abs(score) >= WIN - CELLS:
+            break  # 勝ち負けまで読み切った
+    return best
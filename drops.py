@@ -0,0 +1,79 @@
+# ------------------------------
+# ドロップ抽選（エイリアス法）
+#   表を作るのは1回だけ。1回の抽選は乱数1個 + 配列参照だけの O(1)
+# ------------------------------
+
+import random
+
+from catalog import ITEM_NAMES, RARITY_IDS, RARITY_ORDER
+
+# 採掘のレアリティごとの重み（1アイテムあたり）
+MINE_WEIGHTS = {"common": 50, "uncommon": 30, "rare": 15, "epic": 4, "legendary": 1}
+EXP_PER_LEVEL = 100
+
+
+class AliasTable:
+    """Vose のエイリアス法で重み付き抽選をする。"""
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.n = n
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # 残りは誤差で 1.0 付近のものだけなので、そのまま自分を返す
+
+    def sample(self, rand=random.random):
+        u = rand() * self.n
+        i = int(u)
+        return i if u - i < self.prob[i] else self.alias[i]
+
+
+class DropTable:
+    """(アイテム名, 重み) の組から作るドロップ表。"""
+
+    def __init__(self, entries):
+        self.items = [name for name, _ in entries]
+        self.table = AliasTable([weight for _, weight in entries])
+
+    def roll(self):
+        return self.items[self.table.sample()]
+
+    def roll_many(self, count):
+        """count 回抽選して {アイテム名: 個数} を返す。"""
+        results = {}
+        sample = self.table.sample
+        items = self.items
+        for _ in range(count):
+            item = items[sample()]
+            results[item] = results.get(item, 0) + 1
+        return results
+
+
+MINE_TABLE = DropTable([
+    (ITEM_NAMES[item_id], MINE_WEIGHTS[rarity])
+    for rarity in RARITY_ORDER
+    for item_id in RARITY_IDS[rarity]
+])
+
+
+def roll_mine_exp(count):
+    # 1回あたり 1〜5
+    return sum(random.choices(range(1, 6), k=count))
+
+
+def apply_exp(level, exp, gained):
+    """経験値を足したあとの (レベル, 経験値) をまとめて計算する。"""
+    total = exp + gained
+    return level + total // EXP_PER_LEVEL, total % EXP_PER_LEVEL
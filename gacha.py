@@ -0,0 +1,102 @@
+# ------------------------------
+# ガチャ（gacha_items.json のアイテム）
+#   10連・100連も NumPy でまとめて抽選する（1回ずつ Python でループしない）
+# ------------------------------
+
+import numpy as np
+
+from catalog import GACHA_RARITY_IDS, ITEM_NAMES, ITEMS, RARITY_ORDER
+
+# レアリティごとの排出率（合計 1.0）
+GACHA_RATES = {
+    "common": 0.60,
+    "uncommon": 0.28,
+    "rare": 0.09,
+    "epic": 0.025,
+    "legendary": 0.005,
+}
+# 天井: この回数以内に必ずそのレアリティ以上が出る
+GACHA_PITY = {
+    "rare": 10,
+    "legendary": 90,
+}
+GACHA_COST = 10  # 1回あたりのゴールド
+
+
+class Gacha:
+    def __init__(self, rates=GACHA_RATES, pity=GACHA_PITY, rarity_ids=GACHA_RARITY_IDS, seed=None):
+        self.rng = np.random.default_rng(seed)
+        # 出るアイテムがないレアリティは抽選から外す
+        weights = np.array([rates.get(r, 0.0) if rarity_ids[r] else 0.0 for r in RARITY_ORDER])
+        self.cumulative = np.cumsum(weights / weights.sum())
+        self.cumulative[-1] = 1.0
+        self.pity = {RARITY_ORDER.index(r): limit for r, limit in pity.items()}
+
+        # レアリティごとのアイテムIDを1本の配列に並べておく
+        self.pool = np.array([i for r in RARITY_ORDER for i in rarity_ids[r]], dtype=np.int64)
+        sizes = np.array([len(rarity_ids[r]) for r in RARITY_ORDER], dtype=np.int64)
+        self.sizes = sizes
+        self.starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+    def pull(self, count, counters=None):
+        """count 回まとめて引く。
+
+        counters は天井カウンター {"rare": 前回から外れた回数, ...}（引いたあとの値に書き換える）。
+        戻り値は ({アイテム名: 個数}, {レアリティ: 個数}, {アイテム名: 出たレアリティ})。
+        同じ名前のアイテムが別のレアリティにもあるときは、実際に出た中で一番高いレアリティ。
+        """
+        counters = {} if counters is None else counters
+        rarity = np.searchsorted(self.cumulative, self.rng.random(count), side="right")
+        np.minimum(rarity, len(RARITY_ORDER) - 1, out=rarity)
+
+        # 高いレアリティの天井から先に適用する
+        for level in sorted(self.pity, reverse=True):
+            name = RARITY_ORDER[level]
+            limit = self.pity[level]
+            # 天井を下げたあとの古いカウンターは、次の1回で天井になる値に丸める
+            counter = min(max(counters.get(name, 0), 0), limit - 1)
+            counters[name] = self._apply_pity(rarity, level, limit, counter)
+
+        offsets = (self.rng.random(count) * self.sizes[rarity]).astype(np.int64)
+        item_ids, item_counts = np.unique(self.pool[self.starts[rarity] + offsets], return_counts=True)
+        items = {}
+        item_rarity = {}
+        for item_id, n in zip(item_ids.tolist(), item_counts.tolist()):
+            name = ITEM_NAMES[item_id]
+            items[name] = items.get(name, 0) + n  # 同名のアイテムはまとめる
+            level = RARITY_ORDER.index(ITEMS[item_id]["rarity"])
+            if name not in item_rarity or level > RARITY_ORDER.index(item_rarity[name]):
+                item_rarity[name] = RARITY_ORDER[level]
+
+        rarity_counts = np.bincount(rarity, minlength=len(RARITY_ORDER)).tolist()
+        return items, dict(zip(RARITY_ORDER, rarity_counts)), item_rarity
+
+    @staticmethod
+    def _apply_pity(rarity, level, limit, counter):
+        """level 以上が limit 回連続で出なかったら、その回を level に差し替える。
+
+        ループするのは当たりの回数ぶんだけなので、100万連でも数万回で済む。
+        """
+        count = len(rarity)
+        hits = np.flatnonzero(rarity >= level).tolist()
+        k = 0
+        pos = 0
+        while True:
+            forced = pos + (limit - 1 - counter)  # 天井に届く位置
+            while k < len(hits) and hits[k] < pos:
+                k += 1
+            natural = hits[k] if k < len(hits) else count
+            if natural <= forced:
+                if natural >= count:
+                    return counter + count - pos
+                pos = natural + 1
+                k += 1
+            else:
+                if forced >= count:
+                    return counter + count - pos
+                rarity[forced] = level
+                pos = forced + 1
+            counter = 0
+
+
+GACHA = Gacha()
@@ -0,0 +1,53 @@
+# ------------------------------
+# Bot 全体で使い回す HTTP クライアント
+#   接続はプールして keep-alive で使い回す（毎回 DNS・TLS からやり直さない）
+# ------------------------------
+
+import aiohttp
+
+HTTP_LIMIT = 20          # 同時に張る接続の上限
+HTTP_LIMIT_PER_HOST = 4  # 1つのホストに同時に張る接続の上限（Nominatim の1秒1件は weather.py 側で守る）
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=5)
+USER_AGENT = "GolemBot/1.0 (Discord bot)"  # Nominatim は User-Agent のない要求を断る
+
+
+class HttpClient:
+    def __init__(self, limit=HTTP_LIMIT, limit_per_host=HTTP_LIMIT_PER_HOST,
+                 timeout=HTTP_TIMEOUT, user_agent=USER_AGENT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.session = None
+
+    async def start(self):
+        # ClientSession はイベントループの中で作る必要がある
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300,
+                keepalive_timeout=30,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers={"User-Agent": self.user_agent},
+            )
+
+    async def get_json(self, url, params=None):
+        """GET して (ステータス, JSON) を返す。200 以外なら JSON は None。
+
+        接続できない・時間切れのときは aiohttp.ClientError / asyncio.TimeoutError がそのまま出る。
+        """
+        if self.session is None or self.session.closed:
+            await self.start()
+        async with self.session.get(url, params=params) as resp:
+            if resp.status != 200:
+                return resp.status, None
+            return resp.status, await resp.json(content_type=None)
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
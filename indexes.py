@@ -0,0 +1,136 @@
+# ------------------------------
+# プレイヤー検索用の索引
+#   全員をなめる代わりに、変更のたびに少しずつ更新しておく
+# ------------------------------
+
+import unicodedata
+from bisect import bisect_left, insort
+
+from inventory import total_items
+
+
+def normalize_name(name):
+    """全角/半角・大文字/小文字の違いをならす（「ＡＢＣ」→「abc」, 「ﾕｳﾀ」→「ユウタ」）。"""
+    return unicodedata.normalize("NFKC", name).strip().casefold()
+
+
+class NameIndex:
+    """登録名 → user_id の索引。"""
+
+    def __init__(self):
+        # 正規化した名前 → {user_id: None}（登録順）。古いデータには同じ名前の人が複数いることがある
+        self.by_key = {}
+        self.by_user = {}  # user_id → 登録名（表示用にそのまま）
+
+    def build(self, names):
+        """(user_id, 登録名) の組から作り直す。名前のないプレイヤーは飛ばす。"""
+        self.by_key.clear()
+        self.by_user.clear()
+        for user_id, name in names:
+            self.set(user_id, name)
+
+    def set(self, user_id, name):
+        self.remove(user_id)
+        if not name:
+            return
+        self.by_user[user_id] = name
+        self.by_key.setdefault(normalize_name(name), {})[user_id] = None
+
+    def remove(self, user_id):
+        old = self.by_user.pop(user_id, None)
+        if old is None:
+            return
+        key = normalize_name(old)
+        owners = self.by_key.get(key)
+        if owners is not None:
+            owners.pop(user_id, None)
+            if not owners:
+                del self.by_key[key]
+
+    def update(self, user_id, pdata):
+        # PlayerStore の変更通知から呼ばれる
+        name = pdata.get("name") if pdata else None
+        if self.by_user.get(user_id) != name:
+            self.set(user_id, name)
+
+    def find(self, name):
+        """その名前の user_id（同じ名前が複数いれば先に登録した人）。"""
+        owners = self.by_key.get(normalize_name(name))
+        return next(iter(owners)) if owners else None
+
+    def is_taken(self, name, user_id=None):
+        owners = self.by_key.get(normalize_name(name), ())
+        return any(owner != user_id for owner in owners)
+
+    def names(self):
+        return list(self.by_user.values())
+
+
+class Leaderboard:
+    """スコアの高い順に並んだ索引。
+
+    (-スコア, user_id) のソート済みリストを二分探索で更新する。位置探しも順位も O(log n)、
+    上位N件はスライスするだけ（挿入・削除でずれる分は C の memmove なので十分速い）。
+    """
+
+    def __init__(self):
+        self.entries = []  # (-スコア, user_id) の昇順
+        self.scores = {}
+
+    def update(self, user_id, score):
+        old = self.scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            del self.entries[bisect_left(self.entries, (-old, user_id))]
+            del self.scores[user_id]
+        if score is not None:
+            insort(self.entries, (-score, user_id))
+            self.scores[user_id] = score
+
+    def rank(self, user_id):
+        """1位始まりの順位。載っていなければ None。"""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return bisect_left(self.entries, (-score, user_id)) + 1
+
+    def top(self, count, start=0):
+        return [(user_id, -neg) for neg, user_id in self.entries[start:start + count]]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+RANKING_KEYS = ("level", "gold", "items")
+
+
+class Rankings:
+    """レベル・ゴールド・アイテム数のランキングをまとめて持つ。"""
+
+    def __init__(self):
+        self.boards = {key: Leaderboard() for key in RANKING_KEYS}
+
+    @staticmethod
+    def scores(pdata):
+        return {
+            "level": pdata.get("level"),
+            "gold": pdata.get("gold"),
+            "items": total_items(pdata.get("inventory") or {}),
+        }
+
+    def build(self, rows):
+        """(user_id, level, gold, items) の組から作り直す。"""
+        self.boards = {key: Leaderboard() for key in RANKING_KEYS}
+        for user_id, *values in rows:
+            for key, value in zip(RANKING_KEYS, values):
+                self.boards[key].update(user_id, value)
+
+    def update(self, user_id, pdata):
+        # PlayerStore の変更通知から呼ばれる
+        scores = self.scores(pdata) if pdata else dict.fromkeys(RANKING_KEYS)
+        for key, board in self.boards.items():
+            board.update(user_id, scores[key])
+
+    def __getitem__(self, key):
+        return self.boards[key]
@@ -0,0 +1,51 @@
+# ------------------------------
+# インベントリ操作
+#   インベントリは {アイテム名: 個数} の dict（個数が 0 になったアイテムは消す）
+# ------------------------------
+
+
+def item_name(entry):
+    # 古いデータには {"name": ..., "rarity": ...} 形式のアイテムが混ざっている
+    return entry["name"] if isinstance(entry, dict) else entry
+
+
+def migrate_inventory(inventory):
+    """昔のリスト形式（1個1要素）のインベントリを {アイテム名: 個数} に変換する。"""
+    if isinstance(inventory, dict):
+        return inventory
+    counts = {}
+    for entry in inventory or []:
+        name = item_name(entry)
+        counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def migrate_players(players):
+    for pdata in players.values():
+        if "inventory" in pdata:
+            pdata["inventory"] = migrate_inventory(pdata["inventory"])
+    return players
+
+
+def add_item(inventory, item, count=1):
+    inventory[item] = inventory.get(item, 0) + count
+
+
+def remove_item(inventory, item, count=1):
+    """足りていれば count 個減らして True、足りなければ何もせず False。"""
+    have = inventory.get(item, 0)
+    if have < count:
+        return False
+    if have == count:
+        inventory.pop(item, None)
+    else:
+        inventory[item] = have - count
+    return True
+
+
+def has_item(inventory, item, count=1):
+    return inventory.get(item, 0) >= count
+
+
+def total_items(inventory):
+    return sum(inventory.values())
@@ -0,0 +1,54 @@
+# ------------------------------
+# イベントループの止まり具合を測る
+#   一定間隔で眠って、予定より何ms遅れて起きたかを記録する
+# ------------------------------
+
+import asyncio
+import time
+
+LAG_INTERVAL = 0.05  # 何秒ごとに測るか
+LAG_WINDOW = 600     # 直近何回分を覚えておくか
+
+
+class LoopLagMonitor:
+    def __init__(self, interval=LAG_INTERVAL, window=LAG_WINDOW):
+        self.interval = interval
+        self.window = window
+        self.samples = []  # 遅れ（秒）
+        self.max_lag = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self.samples.append(lag)
+            if len(self.samples) > self.window:
+                del self.samples[0]
+            self.max_lag = max(self.max_lag, lag)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def reset(self):
+        self.samples.clear()
+        self.max_lag = 0.0
+
+    def summary(self):
+        """直近の (平均, 99パーセンタイル, 最大) の遅れを ms で返す。"""
+        if not self.samples:
+            return 0.0, 0.0, 0.0
+        ordered = sorted(self.samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return (
+            sum(ordered) / len(ordered) * 1000,
+            p99 * 1000,
+            ordered[-1] * 1000,
+        )
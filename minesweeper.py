@@ -0,0 +1,210 @@
+# ------------------------------
+# マインスイーパー（!tntgame）の盤面
+#   爆弾の配置とまわりの爆弾の数は NumPy で1回だけ作る（あとは bytearray で持つ）
+#   0 のマスは再帰を使わずにスタックで一気に開ける
+#   最初に開けたマス（とそのまわり）には爆弾を置かない
+#   大きな盤面はボタンではなく絵文字の文字列で表示する（TextBoard）
+# ------------------------------
+
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+
+_rng = np.random.default_rng()
+
+
+@lru_cache(maxsize=None)
+def neighbor_table(width, height):
+    """マスの番号 → まわり8マスの番号 の表（盤面の大きさごとに1回だけ作る）。"""
+    table = []
+    for y in range(height):
+        for x in range(width):
+            table.append(tuple(
+                ny * width + nx
+                for ny in range(max(0, y - 1), min(height, y + 2))
+                for nx in range(max(0, x - 1), min(width, x + 2))
+                if (nx, ny) != (x, y)
+            ))
+    return tuple(table)
+
+
+class Minefield:
+    def __init__(self, width, height, bombs, rng=None):
+        if not 0 < bombs < width * height:
+            raise ValueError("bombs must be between 1 and width * height - 1")
+        self.width = width
+        self.height = height
+        self.bombs = bombs
+        self.rng = _rng if rng is None else rng
+        self.size = width * height
+        self.neighbors = neighbor_table(width, height)
+        self.mines = None  # 最初に開けるまで置かない
+        self.counts = None
+        self.revealed = bytearray(self.size)
+        self.flagged = bytearray(self.size)
+        self.safe_left = self.size - bombs  # まだ開けていない安全なマスの数
+
+    def index(self, x, y):
+        return y * self.width + x
+
+    def place(self, safe_index):
+        """safe_index（入るならそのまわりも）を避けて爆弾を置き、数を数える。"""
+        avoid = np.zeros(self.size, dtype=bool)
+        avoid[safe_index] = True
+        if self.size - len(self.neighbors[safe_index]) - 1 >= self.bombs:
+            avoid[list(self.neighbors[safe_index])] = True
+        candidates = np.flatnonzero(~avoid)
+        self.set_mines(self.rng.choice(candidates, self.bombs, replace=False))
+
+    def set_mines(self, positions):
+        mines = np.zeros((self.height, self.width), dtype=np.uint8)
+        mines.flat[np.asarray(positions, dtype=np.int64)] = 1
+        # まわり8マスの爆弾の数 = 1マスずつずらした盤面を足し合わせたもの（3x3 の畳み込み）
+        padded = np.pad(mines, 1)
+        counts = np.zeros_like(mines)
+        for dy in (0, 1, 2):
+            for dx in (0, 1, 2):
+                if (dy, dx) != (1, 1):
+                    counts += padded[dy:dy + self.height, dx:dx + self.width]
+        self.mines = bytearray(mines.tobytes())
+        self.counts = bytearray(counts.tobytes())
+
+    def is_mine(self, index):
+        return bool(self.mines[index])
+
+    def reveal(self, index):
+        """index を開ける。戻り値は (爆弾を踏んだか, 新しく開いたマスのリスト)。
+
+        数字が 0 のマスからはまわりも続けて開ける。旗を立てたマスは開けない。
+        """
+        if self.mines is None:
+            self.place(index)
+        if self.revealed[index] or self.flagged[index]:
+            return False, []
+        if self.mines[index]:
+            self.revealed[index] = 1
+            return True, [index]
+
+        opened = []
+        stack = [index]
+        self.revealed[index] = 1
+        while stack:
+            i = stack.pop()
+            opened.append(i)
+            if self.counts[i]:
+                continue
+            for n in self.neighbors[i]:
+                if not self.revealed[n] and not self.flagged[n]:
+                    self.revealed[n] = 1
+                    stack.append(n)
+        self.safe_left -= len(opened)
+        return False, opened
+
+    def toggle_flag(self, index):
+        """旗を立てる / 外す。開いているマスなら何もしない。戻り値は旗が立っているか。"""
+        if self.revealed[index]:
+            return False
+        self.flagged[index] ^= 1
+        return bool(self.flagged[index])
+
+    @property
+    def won(self):
+        return self.safe_left == 0
+
+
+# ------------------------------
+# 文字で表示する盤面（!dig B7 / !flag C3 で操作する）
+#   行は上から A, B, C…、列は左から 1, 2, 3…
+# ------------------------------
+
+ROW_LABELS = [chr(0x1F1E6 + i) for i in range(26)]          # 🇦〜🇿
+KEYCAPS = [f"{digit}\ufe0f\u20e3" for digit in range(10)]  # 0️⃣〜9️⃣
+HIDDEN = "⬛"
+OPEN = "⬜"
+FLAG = "🚩"
+MINE = "💣"
+BOOM = "💥"
+WRONG_FLAG = "❌"
+CORNER = "🔲"
+MESSAGE_LIMIT = 2000
+COORDINATE = re.compile(r"([A-Za-z])\s*(\d{1,2})")
+
+
+class TextBoard:
+    """Minefield を絵文字の文字列にする。変わった行だけ作り直す。"""
+
+    def __init__(self, field):
+        self.field = field
+        self.game_over = False
+        self.header = self._header(field.width)
+        self.lines = [self._render_row(y) for y in range(field.height)]
+
+    @staticmethod
+    def _header(width):
+        lines = []
+        if width >= 10:
+            # 10の位（10, 20, 30 の列にだけ数字を出す）
+            lines.append(CORNER + " " + "".join(
+                KEYCAPS[col // 10] if col % 10 == 0 else "➖" for col in range(1, width + 1)
+            ))
+        lines.append(CORNER + " " + "".join(KEYCAPS[col % 10] for col in range(1, width + 1)))
+        return "\n".join(lines)
+
+    @classmethod
+    def max_length(cls, width, height):
+        """いちばん長くなったとき（全部キーキャップの数字）の文字数。"""
+        row = len(ROW_LABELS[0]) + 1 + len(KEYCAPS[0]) * width
+        return len(cls._header(width)) + (1 + row) * height
+
+    @classmethod
+    def fits(cls, width, height, reserve=0):
+        """1通のメッセージ（見出しに reserve 文字使う）に収まる大きさか。"""
+        return (
+            width <= 99 and height <= len(ROW_LABELS)
+            and cls.max_length(width, height) + reserve <= MESSAGE_LIMIT
+        )
+
+    def parse(self, text):
+        """「B7」「b 7」「Ｂ７」をマスの番号にする。盤面の外なら None。"""
+        match = COORDINATE.fullmatch(unicodedata.normalize("NFKC", text).strip())
+        if match is None:
+            return None
+        y = ord(match.group(1).upper()) - ord("A")
+        x = int(match.group(2)) - 1
+        if not (0 <= x < self.field.width and 0 <= y < self.field.height):
+            return None
+        return self.field.index(x, y)
+
+    def cell_text(self, index):
+        field = self.field
+        if field.revealed[index]:
+            if field.mines[index]:
+                return BOOM
+            count = field.counts[index]
+            return KEYCAPS[count] if count else OPEN
+        if self.game_over and field.mines is not None:
+            if field.flagged[index]:
+                return FLAG if field.mines[index] else WRONG_FLAG
+            if field.mines[index]:
+                return MINE
+        return FLAG if field.flagged[index] else HIDDEN
+
+    def _render_row(self, y):
+        start = y * self.field.width
+        cells = "".join(self.cell_text(i) for i in range(start, start + self.field.width))
+        return f"{ROW_LABELS[y]} {cells}"
+
+    def update(self, indexes):
+        """indexes のマスがある行だけ作り直す。"""
+        for y in {i // self.field.width for i in indexes}:
+            self.lines[y] = self._render_row(y)
+
+    def finish(self):
+        # 終わったら爆弾の位置を全部見せる
+        self.game_over = True
+        self.lines = [self._render_row(y) for y in range(self.field.height)]
+
+    def render(self):
+        return self.header + "\n" + "\n".join(self.lines)
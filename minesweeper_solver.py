@@ -0,0 +1,347 @@
+# ------------------------------
+# マインスイーパーの解析（!tntgame hint と「運に頼らず解ける盤面」の生成）
+#   1. 開いている数字から「確実に安全 / 確実に爆弾」を決める（1マスの制約と、制約どうしの包含）
+#   2. それで止まったら、未確定のマスを制約のつながりごとに全部数え上げて爆弾の確率を出す
+#   どれも重いので workers.run_in_process で別プロセスから呼ぶ。引数も戻り値もただの値だけ
+# ------------------------------
+
+import time
+from math import comb
+
+import numpy as np
+
+from minesweeper import Minefield, neighbor_table
+
+HIDDEN_CELL = 255    # view の中で「まだ開いていないマス」を表す値
+HINT_TIME = 1.0      # !tntgame hint に使う秒数
+GENERATE_TIME = 3.0  # 解ける盤面を探すのに使う秒数（過ぎたら普通の盤面にする）
+MAX_COMPONENT = 48   # これより大きいつながりは数え上げずに目安の確率にする
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def board_view(field):
+    """プレイヤーに見えている情報だけの bytes（開いたマスは数字、それ以外は HIDDEN_CELL）。"""
+    if field.mines is None:
+        return bytes([HIDDEN_CELL]) * field.size
+    return bytes(
+        field.counts[i] if field.revealed[i] else HIDDEN_CELL
+        for i in range(field.size)
+    )
+
+
+def deduce(neighbors, view, mines):
+    """数字だけで決まるマスを決める。mines（確実に爆弾のマス）は増やしていく。
+
+    戻り値は (確実に安全な未開のマス, 残った制約のリスト[(マスの frozenset, 残りの爆弾数)])。
+    """
+    safe = set()
+    while True:
+        changed = False
+        constraints = {}
+        for i, count in enumerate(view):
+            if count == HIDDEN_CELL or count == 0:
+                continue
+            unknown = []
+            need = count
+            for n in neighbors[i]:
+                if view[n] != HIDDEN_CELL or n in safe:
+                    continue
+                if n in mines:
+                    need -= 1
+                else:
+                    unknown.append(n)
+            if not unknown:
+                continue
+            if need == 0:
+                safe.update(unknown)
+                changed = True
+            elif need == len(unknown):
+                mines.update(unknown)
+                changed = True
+            else:
+                constraints[frozenset(unknown)] = need
+        if changed:
+            continue
+
+        # 制約 A が制約 B に含まれていれば、B - A には (B の数 - A の数) 個の爆弾がある
+        by_cell = {}
+        for cells in constraints:
+            for cell in cells:
+                by_cell.setdefault(cell, []).append(cells)
+        for a, need_a in constraints.items():
+            others = set()
+            for cell in a:
+                others.update(by_cell[cell])
+            for b in others:
+                if b is a or len(b) <= len(a) or not a < b:
+                    continue
+                rest = b - a
+                need = constraints[b] - need_a
+                if need == 0:
+                    safe.update(rest)
+                    changed = True
+                elif need == len(rest):
+                    mines.update(rest)
+                    changed = True
+        if not changed:
+            return safe, list(constraints.items())
+
+
+def split_components(constraints):
+    """マスを共有している制約どうしをまとめる。戻り値は [(マスのリスト, 制約のリスト)]。"""
+    parent = {}
+
+    def find(cell):
+        while parent[cell] != cell:
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+
+    for cells, _ in constraints:
+        for cell in cells:
+            parent.setdefault(cell, cell)
+        first = find(next(iter(cells)))
+        for cell in cells:
+            root = find(cell)
+            if root != first:
+                parent[root] = first
+
+    groups = {}
+    for constraint in constraints:
+        groups.setdefault(find(next(iter(constraint[0]))), []).append(constraint)
+    result = []
+    for group in groups.values():
+        cells = []
+        seen = set()
+        # 制約の順に並べると、早いうちに制約が閉じて枝刈りが効く
+        for constraint_cells, _ in group:
+            for cell in sorted(constraint_cells):
+                if cell not in seen:
+                    seen.add(cell)
+                    cells.append(cell)
+        result.append((cells, group))
+    return result
+
+
+def enumerate_component(cells, constraints, deadline):
+    """つながり1つの爆弾の置き方を全部数える。
+
+    戻り値は {爆弾の数: [置き方の数, マスごとに爆弾になっている置き方の数のリスト]}。
+    """
+    position = {cell: j for j, cell in enumerate(cells)}
+    need = [n for _, n in constraints]
+    left = [len(c) for c, _ in constraints]
+    touching = [[] for _ in cells]
+    for k, (constraint_cells, _) in enumerate(constraints):
+        for cell in constraint_cells:
+            touching[position[cell]].append(k)
+
+    assignment = [0] * len(cells)
+    results = {}
+    nodes = 0
+
+    def place(j, placed):
+        nonlocal nodes
+        nodes += 1
+        if nodes & 1023 == 0 and time.perf_counter() > deadline:
+            raise _OutOfTime
+        if j == len(cells):
+            entry = results.get(placed)
+            if entry is None:
+                entry = results[placed] = [0, [0] * len(cells)]
+            entry[0] += 1
+            per_cell = entry[1]
+            for x, bit in enumerate(assignment):
+                if bit:
+                    per_cell[x] += 1
+            return
+        for bit in (0, 1):
+            ok = True
+            for k in touching[j]:
+                left[k] -= 1
+                need[k] -= bit
+            for k in touching[j]:
+                if need[k] < 0 or need[k] > left[k]:
+                    ok = False
+                    break
+            if ok:
+                assignment[j] = bit
+                place(j + 1, placed + bit)
+            for k in touching[j]:
+                left[k] += 1
+                need[k] += bit
+        assignment[j] = 0
+
+    place(0, 0)
+    return results
+
+
+def _convolve(a, b):
+    result = {}
+    for ka, va in a.items():
+        for kb, vb in b.items():
+            result[ka + kb] = result.get(ka + kb, 0) + va * vb
+    return result
+
+
+def analyze(width, height, view, bombs, mines=(), deadline=None, probabilities=True):
+    """見えている情報から分かることを全部調べる。
+
+    戻り値は (確実に安全なマスの set, 確実に爆弾のマスの set, {マス: 爆弾の確率} または None)。
+    確率は probabilities=True のときだけ、未開で未確定のマスについて出す。
+    時間切れのつながりは数え上げをやめて、制約から見た目安の確率にする。そのときは
+    残りの爆弾数を使った「確実」は出さず、数え切れたつながりの中だけで確実なものに限る。
+    """
+    if deadline is None:
+        deadline = time.perf_counter() + HINT_TIME
+    neighbors = neighbor_table(width, height)
+    mines = set(mines)
+    safe, constraints = deduce(neighbors, view, mines)
+    if safe and not probabilities:
+        return safe, mines, None
+
+    constrained = set()
+    for cells, _ in constraints:
+        constrained.update(cells)
+    interior = [
+        i for i, count in enumerate(view)
+        if count == HIDDEN_CELL and i not in mines and i not in safe and i not in constrained
+    ]
+    remaining = bombs - len(mines)
+
+    components = []
+    rough = {}
+    for cells, group in split_components(constraints):
+        if len(cells) <= MAX_COMPONENT and time.perf_counter() < deadline:
+            try:
+                components.append((cells, enumerate_component(cells, group, deadline)))
+                continue
+            except _OutOfTime:
+                pass
+        for constraint_cells, need in group:
+            for cell in constraint_cells:
+                rough[cell] = max(rough.get(cell, 0.0), need / len(constraint_cells))
+
+    # 盤面の外側（どの数字にも接していないマス）には残りの爆弾がどう入ってもよい
+    def weight(k):
+        rest = remaining - k - rough_bombs
+        return comb(len(interior), rest) if 0 <= rest <= len(interior) else 0
+
+    rough_bombs = round(sum(rough.values()))
+    distributions = [{k: entry[0] for k, entry in counts.items()} for _, counts in components]
+    total = {0: 1}
+    for distribution in distributions:
+        total = _convolve(total, distribution)
+    z = sum(ways * weight(k) for k, ways in total.items())
+    # 全部のつながりを数え切れて、残りの爆弾数とも合うときだけ、全体から「確実」を決めてよい。
+    # 目安（rough）が混ざると重みが正しくないので、確率は目安として出すだけにする
+    exact = not rough and z > 0
+    if z == 0:
+        # 数え方と残りの爆弾数が合わない（目安を使ったときなど）。外側の重みは見ない
+        def weight(k):
+            return 1
+        z = sum(total.values())
+
+    result = {} if probabilities else None
+    for c, (cells, counts) in enumerate(components):
+        others = {0: 1}
+        for d, distribution in enumerate(distributions):
+            if d != c:
+                others = _convolve(others, distribution)
+        numerators = [0] * len(cells)
+        for k, (_, per_cell) in counts.items():
+            factor = sum(ways * weight(k + rest) for rest, ways in others.items())
+            if factor:
+                for j, n in enumerate(per_cell):
+                    numerators[j] += n * factor
+        if exact:
+            certain_safe = [numerator == 0 for numerator in numerators]
+            certain_mine = [numerator == z for numerator in numerators]
+        else:
+            # 残りの爆弾数を使わなくても、そのつながりの置き方すべてで同じなら確実
+            ways = sum(entry[0] for entry in counts.values())
+            local = [sum(entry[1][j] for entry in counts.values()) for j in range(len(cells))]
+            certain_safe = [ways > 0 and n == 0 for n in local]
+            certain_mine = [ways > 0 and n == ways for n in local]
+        for j, cell in enumerate(cells):
+            if certain_safe[j]:
+                safe.add(cell)
+            elif certain_mine[j]:
+                mines.add(cell)
+            elif result is not None:
+                result[cell] = numerators[j] / z
+
+    if result is not None:
+        result.update(rough)
+        if interior:
+            expected = sum(ways * weight(k) * (remaining - k - rough_bombs) for k, ways in total.items())
+            p = min(max(expected / (z * len(interior)), 0.0), 1.0)
+            for cell in interior:
+                result[cell] = p
+    return safe, mines, result
+
+
+def hint(width, height, view, bombs, time_budget=HINT_TIME):
+    """次に開けるのにいちばん安全なマスを返す。
+
+    戻り値は (マス, 爆弾の確率, 確実に安全か, 確実に爆弾のマスのリスト)。
+    確率が 0.0 でも、目安で出した確率なら「確実」ではない。開けられるマスがなければマスは None。
+    """
+    deadline = time.perf_counter() + time_budget
+    if all(count == HIDDEN_CELL for count in view):
+        # まだ何も開けていない（最初の1手は必ず安全）なら真ん中
+        return (height // 2) * width + width // 2, 0.0, True, []
+    safe, mines, chances = analyze(width, height, view, bombs, deadline=deadline)
+    if safe:
+        return min(safe), 0.0, True, sorted(mines)
+    if not chances:
+        return None, 1.0, False, sorted(mines)
+    cell = min(chances, key=lambda i: (chances[i], i))
+    return cell, chances[cell], False, sorted(mines)
+
+
+def is_solvable(field, start, deadline):
+    """start を開けてから、確実に安全なマスだけを開けて最後までいけるか（field は書き換える）。"""
+    field.reveal(start)
+    view = bytearray(board_view(field))
+    mines = set()
+    while not field.won:
+        if time.perf_counter() > deadline:
+            return False
+        safe, mines, _ = analyze(
+            field.width, field.height, view, field.bombs, mines, deadline, probabilities=False,
+        )
+        if not safe:
+            return False
+        for cell in safe:
+            exploded, opened = field.reveal(cell)
+            if exploded:
+                return False  # 「確実に安全」が外れた（解析の誤り）。解ける盤面とはみなさない
+            for i in opened:
+                view[i] = field.counts[i]
+    return True
+
+
+def generate_solvable(width, height, bombs, start, time_budget=GENERATE_TIME):
+    """start を最初に開ければ運に頼らず解ける爆弾の配置を探す。
+
+    戻り値は爆弾のマスのリスト（Minefield.set_mines に渡す）と試した盤面の数。
+    time_budget 秒で見つからなければリストの代わりに None。
+    """
+    deadline = time.perf_counter() + time_budget
+    rng = np.random.default_rng()  # プロセスごとに別の乱数にする
+    tries = 0
+    while time.perf_counter() < deadline:
+        tries += 1
+        field = Minefield(width, height, bombs, rng)
+        field.place(start)
+        positions = [i for i in range(field.size) if field.mines[i]]
+        try:
+            if is_solvable(field, start, deadline):
+                return positions, tries
+        except _OutOfTime:
+            break
+    return None, tries
@@ -0,0 +1,235 @@
+# ------------------------------
+# 送信キュー（チャンネルごとにまとめて送る）
+#   短い時間に同じチャンネルへ出るメッセージは、2000文字までを1通にまとめる
+#   削除も同じくまとめて1回の一括削除にする
+#   429（レート制限）が返ってきたら Retry-After だけ待ってやり直す
+# ------------------------------
+
+import asyncio
+import heapq
+import itertools
+import unicodedata
+
+import discord
+
+# 優先度（小さいほど先に送る）
+REPLY = 0   # コマンドへの返事
+REPOST = 1  # 発言モードの投稿し直しなど
+
+BATCH_WINDOW = 0.3   # 最初のメッセージからこの秒数のあいだに来たものをまとめる
+REPLY_WINDOW = 0.05  # 返事が入っているときは待ち時間を短くする
+MESSAGE_LIMIT = 2000
+BULK_DELETE_LIMIT = 100
+MAX_PENDING = 200    # 1チャンネルにためておく上限（超えたら優先度の低い古いものから捨てる）
+MAX_RETRIES = 3
+FENCE = "```"
+ZWJ = "\u200d"
+
+
+class _ChannelQueue:
+    __slots__ = ("channel", "items", "deletes", "urgent", "task")
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.items = []    # (優先度, 受付順, 本文, Future) のヒープ
+        self.deletes = []  # (メッセージ, Future)
+        self.urgent = asyncio.Event()
+        self.task = None
+
+
+def _joins_previous(ch):
+    """前の文字とつながって1つの絵文字・文字になる文字か（異体字セレクタ・キーキャップ・肌の色など）。"""
+    return unicodedata.category(ch) in ("Mn", "Me", "Cf") or 0x1F3FB <= ord(ch) <= 0x1F3FF
+
+
+def _cut(text, budget, first):
+    """text[:budget] のどこで切るか（first より後ろだけ）。戻り値は (切る位置, 区切りとして捨てる文字数)。"""
+    # 1. 最後の改行
+    cut = text.rfind("\n", first + 1, budget + 1)
+    if cut > first:
+        return cut, 1
+    # 2. 最後の空白
+    for cut in range(budget, first, -1):
+        if text[cut].isspace():
+            return cut, 1
+    # 3. 区切りがないときだけ途中で切る。絵文字の途中と <@id> の途中は避ける
+    cut = budget
+    while cut > first + 1 and (_joins_previous(text[cut]) or text[cut - 1] == ZWJ):
+        cut -= 1
+    start = text.rfind("<", 0, cut)
+    if start > first and text.find(">", start, cut) == -1:
+        cut = start
+    return cut, 0
+
+
+def split_text(text, limit=MESSAGE_LIMIT):
+    """limit 文字を超える1つのメッセージを、改行 → 空白の順で区切りのよいところで分ける。
+
+    コードブロックの途中で切れたら、閉じてから次のかたまりで開き直す。
+    開き直した "```\n" より前では切らない（切ると残りが短くならず、いつまでも終わらない）。
+    """
+    reopen = FENCE + "\n"
+    pieces = []
+    while len(text) > limit:
+        length = len(text)
+        cut, skip = _cut(text, limit - len("\n" + FENCE), len(reopen))
+        piece, text = text[:cut], text[cut + skip:]
+        if piece.count(FENCE) % 2:
+            piece += "\n" + FENCE
+            text = reopen + text
+        assert len(text) < length, "split_text が進んでいない"
+        pieces.append(piece)
+    pieces.append(text)
+    return pieces
+
+
+def pack(texts, limit=MESSAGE_LIMIT):
+    """texts を改行でつなぎ、limit 文字以内のかたまりに分ける。
+
+    戻り値は (本文, そのかたまりに入った texts の番号のリスト) のリスト。
+    1つで limit を超えるものは、それだけを split_text で分ける。
+    """
+    chunks = []
+    current = []
+    indexes = []
+    length = 0
+    for i, text in enumerate(texts):
+        if len(text) > limit:
+            if current:
+                chunks.append(("\n".join(current), indexes))
+                current, indexes, length = [], [], 0
+            for piece in split_text(text, limit):
+                chunks.append((piece, [i]))
+            continue
+        added = len(text) + (1 if current else 0)
+        if current and length + added > limit:
+            chunks.append(("\n".join(current), indexes))
+            current, indexes, length = [], [], 0
+            added = len(text)
+        current.append(text)
+        indexes.append(i)
+        length += added
+    if current:
+        chunks.append(("\n".join(current), indexes))
+    return chunks
+
+
+class Outbox:
+    def __init__(self, window=BATCH_WINDOW, reply_window=REPLY_WINDOW,
+                 limit=MESSAGE_LIMIT, max_pending=MAX_PENDING):
+        self.window = window
+        self.reply_window = reply_window
+        self.limit = limit
+        self.max_pending = max_pending
+        self.queues = {}  # チャンネルID → _ChannelQueue
+        self._seq = itertools.count()
+        self.queued = 0   # 受け付けたメッセージ数
+        self.sent = 0     # 実際に送った回数
+        self.dropped = 0
+        self.retries = 0
+
+    def _queue(self, channel):
+        queue = self.queues.get(channel.id)
+        if queue is None:
+            queue = self.queues[channel.id] = _ChannelQueue(channel)
+        return queue
+
+    def _kick(self, queue, urgent):
+        if urgent:
+            queue.urgent.set()
+        if queue.task is None:
+            queue.task = asyncio.get_running_loop().create_task(self._run(queue))
+
+    def send(self, channel, content, priority=REPOST):
+        """送信を予約する。送れたら True、送れなかったら False になる Future を返す。"""
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queue(channel)
+        heapq.heappush(queue.items, (priority, next(self._seq), content, future))
+        self.queued += 1
+        if len(queue.items) > self.max_pending:
+            # 優先度の一番低いものの中で、一番古いものを捨てる
+            lowest = max(entry[0] for entry in queue.items)
+            worst = min(entry for entry in queue.items if entry[0] == lowest)
+            queue.items.remove(worst)
+            heapq.heapify(queue.items)
+            worst[3].set_result(False)
+            self.dropped += 1
+        self._kick(queue, priority == REPLY)
+        return future
+
+    def delete(self, message):
+        """削除を予約する。消せたら True、消せなかったら False になる Future を返す。"""
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queue(message.channel)
+        queue.deletes.append((message, future))
+        self._kick(queue, False)
+        return future
+
+    async def _run(self, queue):
+        try:
+            while queue.items or queue.deletes:
+                try:
+                    await asyncio.wait_for(queue.urgent.wait(), self.window)
+                    # 返事が来たら少しだけ待って、同時に来た分とまとめる
+                    await asyncio.sleep(self.reply_window)
+                except asyncio.TimeoutError:
+                    pass
+                queue.urgent.clear()
+                await self._flush_deletes(queue)
+                await self._flush_items(queue)
+        finally:
+            queue.task = None
+            if not queue.items and not queue.deletes:
+                self.queues.pop(queue.channel.id, None)
+
+    async def _flush_deletes(self, queue):
+        deletes, queue.deletes = queue.deletes, []
+        bulk = getattr(queue.channel, "delete_messages", None)
+        for start in range(0, len(deletes), BULK_DELETE_LIMIT):
+            batch = deletes[start:start + BULK_DELETE_LIMIT]
+            try:
+                if len(batch) == 1 or bulk is None:
+                    for message, _ in batch:
+                        await self._call(message.delete)
+                else:
+                    await self._call(bulk, [message for message, _ in batch])
+                ok = True
+            except (discord.HTTPException, discord.RateLimited):
+                # Forbidden・NotFound など。投稿し直しはやめておく
+                ok = False
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(ok)
+
+    async def _flush_items(self, queue):
+        items = [heapq.heappop(queue.items) for _ in range(len(queue.items))]
+        if not items:
+            return
+        for content, indexes in pack([item[2] for item in items], self.limit):
+            try:
+                await self._call(queue.channel.send, content)
+                self.sent += 1
+                ok = True
+            except (discord.HTTPException, discord.RateLimited) as e:
+                print(f"⚠️ メッセージを送れませんでした: {e}")
+                ok = False
+            for i in indexes:
+                future = items[i][3]
+                if not future.done():
+                    future.set_result(ok)
+
+    async def _call(self, func, *args):
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return await func(*args)
+            except discord.HTTPException as e:
+                if e.status != 429 or attempt == MAX_RETRIES:
+                    raise
+                retry_after = e.response.headers.get("Retry-After") if e.response is not None else None
+                delay = float(retry_after) if retry_after else 2 ** attempt
+            except discord.RateLimited as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                delay = e.retry_after
+            self.retries += 1
+            await asyncio.sleep(delay)
@@ -0,0 +1,91 @@
+# ------------------------------
+# コマンドの連打対策（トークンバケット）
+#   1人×コマンドごと・1人ごと・Bot全体の3つのバケツを通ったコマンドだけ実行する
+#   バケツは (残りトークン, 最後に使った時刻) の組だけ。使われていないものは LRU で捨てる
+# ------------------------------
+
+import time
+from collections import OrderedDict, namedtuple
+
+from discord.ext import commands
+
+# rate: 1秒あたりに回復する回数, burst: 続けて使える回数
+Rule = namedtuple("Rule", "rate burst")
+
+DEFAULT_RULE = Rule(1.0, 5)
+RATE_LIMITS = {
+    "mine": Rule(0.5, 3),
+    "spin": Rule(0.2, 2),
+    "quest": Rule(0.1, 2),
+    "gacha": Rule(0.2, 3),
+    "tenki": Rule(0.2, 2),
+    # 絵文字を大量に送るコマンド
+    "桜よ舞い降りろ": Rule(0.1, 2),
+    "彗星に願いを": Rule(0.1, 2),
+    "犬ちゃん大放出": Rule(0.1, 2),
+    "ゆうた出現": Rule(0.1, 2),
+}
+USER_RULE = Rule(2.0, 10)      # 1人がコマンド全体で使える回数
+GLOBAL_RULE = Rule(30.0, 60)   # Bot 全体（Discord のレート制限 50回/秒 より下に抑える）
+NOTICE_RULE = Rule(0.1, 1)     # 「待ってね」の通知自体も連打しない
+MAX_BUCKETS = 10000
+
+
+class RateLimited(commands.CheckFailure):
+    def __init__(self, retry_after):
+        super().__init__(f"rate limited, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    def __init__(self, limits=RATE_LIMITS, default=DEFAULT_RULE, user_rule=USER_RULE,
+                 global_rule=GLOBAL_RULE, max_buckets=MAX_BUCKETS, clock=time.monotonic):
+        self.limits = limits
+        self.default = default
+        self.user_rule = user_rule
+        self.global_rule = global_rule
+        self.max_buckets = max_buckets
+        self.clock = clock
+        self.buckets = OrderedDict()  # キー → (残りトークン, 時刻)
+        self.rejected = 0
+
+    def _tokens(self, key, rule, now):
+        entry = self.buckets.get(key)
+        if entry is None:
+            return rule.burst
+        tokens, stamp = entry
+        return min(rule.burst, tokens + (now - stamp) * rule.rate)
+
+    def consume(self, *checks):
+        """(キー, Rule) の組をすべて1回ずつ使う。
+
+        どれか1つでも空なら何も減らさず、使えるようになるまでの秒数を返す。使えたら 0。
+        """
+        now = self.clock()
+        tokens = [self._tokens(key, rule, now) for key, rule in checks]
+        retry_after = 0.0
+        for left, (_, rule) in zip(tokens, checks):
+            if left < 1:
+                retry_after = max(retry_after, (1 - left) / rule.rate)
+        if retry_after:
+            self.rejected += 1
+            return retry_after
+
+        for left, (key, _) in zip(tokens, checks):
+            self.buckets[key] = (left - 1, now)
+            self.buckets.move_to_end(key)
+        # しばらく使われていないバケツは満タンに戻っているので、捨てても困らない
+        while len(self.buckets) > self.max_buckets:
+            self.buckets.popitem(last=False)
+        return 0.0
+
+    def hit(self, user_id, command):
+        rule = self.limits.get(command, self.default)
+        return self.consume(
+            ((user_id, command), rule),
+            (user_id, self.user_rule),
+            (None, self.global_rule),
+        )
+
+    def should_notice(self, user_id):
+        return not self.consume((("notice", user_id), NOTICE_RULE))
@@ -0,0 +1,138 @@
+# ------------------------------
+# 返事待ちの振り分け（bot.wait_for の代わり）
+#   (チャンネル, 発言者) をキーに待っている人を引くので、ほかの人の待ちが何件あっても1件ずつ見て回らない
+#   ボタンの返事は Waiter に直接渡すので、同じ人の別の返事待ちには紛れ込まない
+#   時間切れは全員分を1つのタイマー（ヒープ）でまとめて見る
+# ------------------------------
+
+import asyncio
+import heapq
+import itertools
+from collections import deque
+
+
+class Waiter:
+    """1件の返事待ち。ReplyRouter.expect() が返す。
+
+    メッセージは ReplyRouter.dispatch() から届く。ボタンなどメッセージ以外の返事は
+    この待ちに直接 resolve() する（同じ人の別の待ちに紛れ込まない）。
+    """
+
+    __slots__ = ("router", "key", "future", "accept")
+
+    def __init__(self, router, key, future, accept):
+        self.router = router
+        self.key = key
+        self.future = future
+        self.accept = accept
+
+    def resolve(self, value):
+        """メッセージの代わりに値を渡す（ボタンが押されたときなど）。渡せたら True。"""
+        if self.future.done():
+            return False
+        self.future.set_result(value)
+        return True
+
+    def cancel(self):
+        """待つのをやめる（もう終わっていれば何もしない）。"""
+        if not self.future.done():
+            self.future.cancel()
+        self.router._discard(self.key, self.future)
+
+    async def result(self):
+        """返事（メッセージか resolve() の値）を待つ。期限が来たら asyncio.TimeoutError。"""
+        try:
+            return await self.future
+        finally:
+            self.router._discard(self.key, self.future)
+
+
+class ReplyRouter:
+    def __init__(self):
+        self.waiters = {}  # (channel_id, author_id) → deque[Waiter]
+        self.timers = []   # (期限, 受付順, Future) のヒープ。返事が来た分は期限が来たときに捨てる
+        self._seq = itertools.count()
+        self._wake = None
+        self._timer_task = None
+
+    def expect(self, channel_id, author_id, timeout, accept=None):
+        """channel_id での author_id の発言を待ち始めて、その Waiter を返す。
+
+        accept(message) が False のメッセージは受け取らない（同じ人の次の待ちに回す）。
+        """
+        loop = asyncio.get_running_loop()
+        key = (channel_id, author_id)
+        waiter = Waiter(self, key, loop.create_future(), accept)
+        self.waiters.setdefault(key, deque()).append(waiter)
+        heapq.heappush(self.timers, (loop.time() + timeout, next(self._seq), waiter.future))
+        self._start_timer()
+        return waiter
+
+    async def wait(self, channel_id, author_id, timeout, accept=None):
+        """channel_id で author_id が発言するのを待って、そのメッセージを返す。
+
+        timeout 秒たったら asyncio.TimeoutError。
+        """
+        return await self.expect(channel_id, author_id, timeout, accept).result()
+
+    def dispatch(self, message):
+        """届いたメッセージを、それを受け取る待ちのうち一番先に来た1つに渡す。渡せたら True。"""
+        queue = self._queue((message.channel.id, message.author.id))
+        if not queue:
+            return False
+        for waiter in queue:
+            if waiter.future.done():
+                continue
+            if waiter.accept is None or waiter.accept(message):
+                queue.remove(waiter)
+                waiter.future.set_result(message)
+                return True
+        return False
+
+    def _queue(self, key):
+        queue = self.waiters.get(key)
+        # 時間切れになった直後で、まだ片付いていない待ちは飛ばす
+        while queue and queue[0].future.done():
+            queue.popleft()
+        return queue
+
+    def _discard(self, key, future):
+        queue = self.waiters.get(key)
+        if queue is None:
+            return
+        for waiter in queue:
+            if waiter.future is future:
+                queue.remove(waiter)
+                break
+        if not queue:
+            del self.waiters[key]
+
+    def _start_timer(self):
+        if self._timer_task is None:
+            self._wake = asyncio.Event()
+            self._timer_task = asyncio.get_running_loop().create_task(self._run_timers())
+        else:
+            # 今より早い期限が入ったかもしれないので、眠り直してもらう
+            self._wake.set()
+
+    async def _run_timers(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self.timers:
+                deadline, _, future = self.timers[0]
+                if future.done():
+                    heapq.heappop(self.timers)
+                    continue
+                delay = deadline - loop.time()
+                if delay > 0:
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                heapq.heappop(self.timers)
+                if not future.done():
+                    future.set_exception(asyncio.TimeoutError())
+        finally:
+            self._timer_task = None
@@ -0,0 +1,97 @@
+# ------------------------------
+# 発言モード（/mode）の変換
+#   置き換え表は最初に1回だけ組み立て、当てはまらないメッセージは何も作らずにそのまま返す
+#   on_message で使う user_id → モード の対応は、モードを設定している人だけの小さな dict に持つ
+# ------------------------------
+
+import re
+
+
+class SpeechMode:
+    """前につける言葉・後ろにつける言葉・置き換え表からなる発言モード。
+
+    置き換えは作るときに1回だけ形を決める。
+      - 置き換える言葉どうし・置き換え後の言葉と重ならない表: str.replace を順に（短い文ではこれが最速で、
+        1回ずつなめても結果は1パスと同じ）
+      - 重なる表: すべての言葉をまとめた正規表現で1パス
+    """
+
+    def __init__(self, prefix="", suffix="", replace=None):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.replace = replace or {}
+        self.pairs = ()
+        self.pattern = None
+        if self.replace and self._independent(self.replace):
+            self.pairs = tuple(self.replace.items())
+        elif self.replace:
+            # 長いものから順に試す（重なる言葉があっても長いほうが先に当たるように）
+            words = sorted(self.replace, key=len, reverse=True)
+            self.pattern = re.compile("|".join(map(re.escape, words)))
+
+    @staticmethod
+    def _independent(replace):
+        words = list(replace)
+        for i, word in enumerate(words):
+            others = words[:i] + words[i + 1:] + list(replace.values())
+            if any(word in text or text in word for text in others if text):
+                return False
+        return True
+
+    def _sub(self, match):
+        return self.replace[match.group()]
+
+    def apply(self, text):
+        """変換した文を返す。何も変わらないときは text そのもの（同じオブジェクト）を返す。"""
+        # str.replace も re.sub も、当てはまらなければ新しい文字列を作らずに元を返す
+        for old, new in self.pairs:
+            text = text.replace(old, new)
+        if self.pattern is not None:
+            text = self.pattern.sub(self._sub, text)
+        if self.prefix or self.suffix:
+            text = self.prefix + text + self.suffix
+        return text
+
+
+MODE_PHRASES = {
+    "猫": SpeechMode(suffix="にゃん♪"),
+    "お嬢様": SpeechMode(prefix="わたくし、", suffix="でございますわ。"),
+    "中二病": SpeechMode(replace={"です": "なのだ", "ます": "なのだ"}),
+    "執事": SpeechMode(prefix="かしこまりました。"),
+    "幼女": SpeechMode(replace={"です": "だよ", "ます": "だよ"}),
+    "ロボ": SpeechMode(replace={"です": "デス", "ます": "デス"}),
+    "さくらみこ": SpeechMode(suffix="みこ～"),
+}
+
+
+class SpeechModes:
+    """user_id → SpeechMode。変換しないモード（「平和」など）の人は入れない。"""
+
+    def __init__(self, modes=MODE_PHRASES):
+        self.modes = modes
+        self.by_user = {}
+
+    def build(self, rows):
+        """(user_id, モード名) の組から作り直す。"""
+        self.by_user.clear()
+        for user_id, mode in rows:
+            self.set(user_id, mode)
+
+    def set(self, user_id, mode):
+        speech = self.modes.get(mode)
+        if speech is None:
+            self.by_user.pop(user_id, None)
+        else:
+            self.by_user[user_id] = speech
+
+    def update(self, user_id, pdata):
+        # PlayerStore の変更通知から呼ばれる
+        self.set(user_id, pdata.get("mode") if pdata else None)
+
+    def convert(self, user_id, text):
+        """モードに合わせて変換した文を返す。変換しない・変わらないときは None。"""
+        speech = self.by_user.get(user_id)
+        if speech is None:
+            return None
+        converted = speech.apply(text)
+        return None if converted is text else converted
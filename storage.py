@@ -0,0 +1,666 @@
+# ------------------------------
+# プレイヤーデータの保存（遅延書き込み + 保存先の切り替え）
+#   JsonBackend:   game_data.json に全員分をまとめて保存（従来どおり）
+#   SqliteBackend: game_data.db に変更のあったプレイヤーの行だけ保存
+#   JournalBackend: 変更を1行ずつ追記し、ときどきスナップショットにまとめる
+#   LazyPlayers:   SqliteBackend のプレイヤーを使うときだけ読み込む
+# ------------------------------
+
+import asyncio
+import glob
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+
+from inventory import add_item, migrate_inventory, migrate_players, remove_item, total_items
+
+DATA_FILE = "game_data.json"
+DB_FILE = "game_data.db"
+JOURNAL_FILE = "game_data.journal"
+FLUSH_INTERVAL = 30.0  # この秒数ごとにまとめて保存
+MAX_DIRTY = 50         # 未保存のプレイヤーがこの人数に達したらすぐ保存
+COMPACT_EVERY = 10000  # ジャーナルがこの件数たまったらスナップショットにまとめる
+COMPACT_BYTES = 16 * 1024 * 1024  # 件数が少なくても、この大きさを超えたらまとめる
+PLAYER_CACHE_SIZE = 1000  # LazyPlayers がメモリに置いておく人数
+
+
+def atomic_write_json(path, data):
+    """一時ファイルに書き出してから rename する。途中で落ちても元のファイルは壊れない。"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def copy_player(pdata):
+    """保存用にレコードを写し取る。値の dict / list（インベントリ・ペットなど）も1段だけコピーする。
+
+    中身はどれも数値か文字列なので、これで書き込み中にコマンドが元を書き換えても影響しない。
+    """
+    return {
+        key: value.copy() if isinstance(value, (dict, list)) else value
+        for key, value in pdata.items()
+    }
+
+
+def apply_changes(players, changes):
+    """PlayerStore.record() と同じ形式の変更を players に反映する（ジャーナルの再生用）。"""
+    for user_id, change in changes.items():
+        if "put" in change:
+            players[user_id] = migrate_players({user_id: change["put"]})[user_id]
+            continue
+        pdata = players.setdefault(user_id, {})
+        pdata.update(change.get("set", {}))
+        inventory = pdata.setdefault("inventory", {})
+        for item, delta in change.get("inv", {}).items():
+            if delta > 0:
+                add_item(inventory, item, delta)
+            else:
+                remove_item(inventory, item, min(-delta, inventory.get(item, 0)))
+
+
+class JsonBackend:
+    """game_data.json 1ファイルに全員分を保存する。"""
+
+    def __init__(self, path=DATA_FILE):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return migrate_players(data.get("player_data", {}))
+
+    def append(self, kind, changes, players):
+        pass
+
+    def snapshot(self, players, user_ids):
+        # 1ファイルなので、誰が変わっても全員分を書き直すしかない
+        return {user_id: copy_player(pdata) for user_id, pdata in players.items()}
+
+    def write(self, snapshot):
+        atomic_write_json(self.path, {"player_data": snapshot})
+
+    def save(self, players, user_ids):
+        self.write(self.snapshot(players, user_ids))
+
+    def close(self):
+        pass
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    user_id TEXT PRIMARY KEY,
+    name    TEXT,
+    level   INTEGER,
+    exp     INTEGER,
+    gold    INTEGER,
+    data    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_players_name  ON players(name);
+CREATE INDEX IF NOT EXISTS idx_players_level ON players(level);
+CREATE INDEX IF NOT EXISTS idx_players_gold  ON players(gold);
+
+CREATE TABLE IF NOT EXISTS inventories (
+    user_id TEXT NOT NULL,
+    item    TEXT NOT NULL,
+    count   INTEGER NOT NULL,
+    PRIMARY KEY (user_id, item)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_inventories_item ON inventories(item);
+
+CREATE TABLE IF NOT EXISTS pets (
+    user_id TEXT PRIMARY KEY,
+    name    TEXT NOT NULL,
+    level   INTEGER NOT NULL,
+    exp     INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS structures (
+    user_id TEXT NOT NULL,
+    slot    INTEGER NOT NULL,
+    name    TEXT NOT NULL,
+    PRIMARY KEY (user_id, slot)
+) WITHOUT ROWID;
+"""
+
+# players テーブルで専用の列を持つ項目（残りは data 列に JSON で入れる）
+COLUMNS = ("name", "level", "exp", "gold")
+SEPARATE = COLUMNS + ("inventory", "pet", "structures")
+
+
+class SqliteBackend:
+    """SQLite（WALモード）に保存する。保存するのは変更のあったプレイヤーの行だけ。"""
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        # 書き込みは保存用スレッドから別の接続で行う（WAL なので読み込みとぶつからない）
+        self.writer = sqlite3.connect(path, check_same_thread=False)
+        self.writer.execute("PRAGMA synchronous=NORMAL")
+
+    def load(self):
+        return self._select("", ())
+
+    def load_player(self, user_id):
+        return self._select(" WHERE user_id = ?", (user_id,)).get(user_id)
+
+    def player_ids(self):
+        return [user_id for (user_id,) in self.conn.execute("SELECT user_id FROM players")]
+
+    def player_names(self):
+        return self.conn.execute("SELECT user_id, name FROM players WHERE name IS NOT NULL").fetchall()
+
+    def player_modes(self):
+        return self.conn.execute(
+            "SELECT user_id, json_extract(data, '$.mode') AS mode FROM players WHERE mode IS NOT NULL"
+        ).fetchall()
+
+    def player_scores(self):
+        return self.conn.execute(
+            "SELECT p.user_id, p.level, p.gold, COALESCE(SUM(i.count), 0)"
+            " FROM players p LEFT JOIN inventories i ON i.user_id = p.user_id"
+            " GROUP BY p.user_id"
+        ).fetchall()
+
+    def _select(self, where, params):
+        players = {}
+        for user_id, name, level, exp, gold, data in self.conn.execute(
+            f"SELECT user_id, name, level, exp, gold, data FROM players{where}", params
+        ):
+            pdata = json.loads(data)
+            for key, value in zip(COLUMNS, (name, level, exp, gold)):
+                if value is not None:
+                    pdata[key] = value
+            pdata["inventory"] = {}
+            pdata["structures"] = []
+            players[user_id] = pdata
+
+        for user_id, item, count in self.conn.execute(
+            f"SELECT user_id, item, count FROM inventories{where}", params
+        ):
+            if user_id in players:
+                players[user_id]["inventory"][item] = count
+        for user_id, name, level, exp in self.conn.execute(
+            f"SELECT user_id, name, level, exp FROM pets{where}", params
+        ):
+            if user_id in players:
+                players[user_id]["pet"] = {"name": name, "level": level, "exp": exp}
+        for user_id, name in self.conn.execute(
+            f"SELECT user_id, name FROM structures{where} ORDER BY user_id, slot", params
+        ):
+            if user_id in players:
+                players[user_id]["structures"].append(name)
+        return players
+
+    def append(self, kind, changes, players):
+        pass
+
+    def snapshot(self, players, user_ids):
+        snapshot = {}
+        for user_id in user_ids:
+            pdata = players.get(user_id)
+            snapshot[user_id] = copy_player(pdata) if pdata is not None else None
+        return snapshot
+
+    def write(self, snapshot):
+        with self.writer:
+            for user_id, pdata in snapshot.items():
+                self._delete(user_id)
+                if pdata is not None:
+                    self._insert(user_id, pdata)
+
+    def save(self, players, user_ids):
+        self.write(self.snapshot(players, user_ids))
+
+    def _delete(self, user_id):
+        for table in ("players", "inventories", "pets", "structures"):
+            self.writer.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+
+    def _insert(self, user_id, pdata):
+        data = {key: value for key, value in pdata.items() if key not in SEPARATE}
+        pet = pdata.get("pet")
+        if "pet" in pdata and not pet:
+            data["pet"] = None
+        self.writer.execute(
+            "INSERT INTO players (user_id, name, level, exp, gold, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, *(pdata.get(key) for key in COLUMNS), json.dumps(data, ensure_ascii=False)),
+        )
+
+        counts = migrate_inventory(pdata.get("inventory", {}))
+        self.writer.executemany(
+            "INSERT INTO inventories (user_id, item, count) VALUES (?, ?, ?)",
+            [(user_id, item, count) for item, count in counts.items()],
+        )
+        if pet:
+            self.writer.execute(
+                "INSERT INTO pets (user_id, name, level, exp) VALUES (?, ?, ?, ?)",
+                (user_id, pet["name"], pet["level"], pet["exp"]),
+            )
+        self.writer.executemany(
+            "INSERT INTO structures (user_id, slot, name) VALUES (?, ?, ?)",
+            [(user_id, slot, name) for slot, name in enumerate(pdata.get("structures", []))],
+        )
+
+    def close(self):
+        self.writer.close()
+        self.conn.close()
+
+
+class JournalBackend:
+    """変更を1件1行でジャーナルに追記する。起動時はスナップショットを読んで続きを再生する。
+
+    スナップショットは game_data.json と同じ形式（"journal_seq" まで反映済み）。
+    まとめ終わったジャーナルは game_data.journal.<最後の番号> として残るので、
+    トレードの揉め事などはそこから追える（不要なら消してよい）。
+    """
+
+    def __init__(self, path=DATA_FILE, journal_path=JOURNAL_FILE, compact_every=COMPACT_EVERY,
+                 compact_bytes=COMPACT_BYTES):
+        self.path = path
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        self.compact_bytes = compact_bytes
+        self.seq = 0
+        self.pending = 0  # 前回のスナップショット以降の件数
+        self.known = set()
+        self.journal = None
+
+    def load(self):
+        players = {}
+        snapshot_seq = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            players = migrate_players(data.get("player_data", {}))
+            snapshot_seq = data.get("journal_seq", 0)
+        self.seq = snapshot_seq
+
+        # スナップショット作成中に落ちた場合は、退避済みのジャーナルにも続きが残っている
+        segments = []
+        for path in glob.glob(glob.escape(self.journal_path) + ".*"):
+            suffix = path.rsplit(".", 1)[1]
+            if suffix.isdigit() and int(suffix) > snapshot_seq:
+                segments.append((int(suffix), path))
+        paths = [path for _, path in sorted(segments)] + [self.journal_path]
+
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # 書き込み途中で落ちた最後の行
+                    if entry["n"] <= self.seq:
+                        continue
+                    apply_changes(players, entry["p"])
+                    self.seq = entry["n"]
+                    self.pending += 1
+
+        self.known = set(players)
+        self._open_journal()
+        return players
+
+    def _open_journal(self):
+        # 途中で切れた行に続けて書かないように改行しておく
+        needs_newline = False
+        if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > 0:
+            with open(self.journal_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        self.journal = open(self.journal_path, "a", encoding="utf-8")
+        if needs_newline:
+            self.journal.write("\n")
+
+    def append(self, kind, changes, players):
+        entry = {}
+        for user_id, change in changes.items():
+            if user_id not in self.known:
+                # 初めて出てくるプレイヤーはレコードごと書く
+                entry[user_id] = {"put": players[user_id]}
+                self.known.add(user_id)
+            else:
+                entry[user_id] = change
+        self.seq += 1
+        self.pending += 1
+        line = json.dumps(
+            {"n": self.seq, "t": int(time.time()), "k": kind, "p": entry},
+            ensure_ascii=False, separators=(",", ":"),
+        )
+        self.journal.write(line + "\n")
+        self.journal.flush()
+
+    def snapshot(self, players, user_ids):
+        """件数か大きさがたまっていればジャーナルを退避して全員分を写し取る。そうでなければ None。
+
+        退避までは呼び出し側（イベントループ）で済ませるので、write() の間に追記されたものは
+        新しいジャーナルに入る。
+        """
+        if self.pending < self.compact_every and self.journal.tell() < self.compact_bytes:
+            return None
+        self.journal.close()
+        if os.path.exists(self.journal_path):
+            os.replace(self.journal_path, f"{self.journal_path}.{self.seq}")
+        self._open_journal()
+        self.known = set(players)
+        self.pending = 0
+        return {
+            "player_data": {user_id: copy_player(pdata) for user_id, pdata in players.items()},
+            "journal_seq": self.seq,
+        }
+
+    def write(self, snapshot):
+        if snapshot is None:
+            os.fsync(self.journal.fileno())
+        else:
+            # 書けなくても退避したジャーナルが残っているので、次の起動時に再生される
+            atomic_write_json(self.path, snapshot)
+
+    def save(self, players, user_ids):
+        self.write(self.snapshot(players, user_ids))
+
+    def close(self):
+        if self.journal is None:
+            return
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.journal.close()
+        self.journal = None
+
+
+def import_json(json_path=DATA_FILE, db_path=DB_FILE):
+    """game_data.json の中身をまとめて SQLite に移す（1回だけ実行する移行用）。"""
+    players = JsonBackend(json_path).load()
+    backend = SqliteBackend(db_path)
+    try:
+        backend.save(players, list(players))
+    finally:
+        backend.close()
+    return len(players)
+
+
+class LazyPlayers(MutableMapping):
+    """プレイヤーを初めて使うときに1人ずつ読み込む player_data（SqliteBackend 用）。
+
+    メモリに置くのは最近使った capacity 人まで。あふれた人のうち未保存の変更がある人
+    （is_dirty が True）は、保存が済んで release() されるまで pinned に残しておく。
+    知らない user_id を [] で引くと defaultdict と同じく default_factory で作る。
+    """
+
+    def __init__(self, default_factory, capacity=PLAYER_CACHE_SIZE):
+        self.default_factory = default_factory
+        self.capacity = capacity
+        self.backend = None
+        self.is_dirty = None
+        self.ids = set()
+        self.cache = OrderedDict()
+        self.pinned = {}
+
+    def load_ids(self, backend):
+        self.backend = backend
+        self.ids = set(backend.player_ids())
+        self.cache.clear()
+        self.pinned.clear()
+
+    def __contains__(self, user_id):
+        return user_id in self.ids
+
+    def __getitem__(self, user_id):
+        pdata = self.cache.get(user_id)
+        if pdata is not None:
+            self.cache.move_to_end(user_id)
+            return pdata
+        pdata = self.pinned.pop(user_id, None)
+        if pdata is None and user_id in self.ids:
+            pdata = self.backend.load_player(user_id)
+        if pdata is None:
+            pdata = self.default_factory()
+        self[user_id] = pdata
+        return pdata
+
+    def get(self, user_id, default=None):
+        return self[user_id] if user_id in self.ids else default
+
+    def setdefault(self, user_id, default=None):
+        if user_id not in self.ids:
+            self[user_id] = default
+        return self[user_id]
+
+    def __setitem__(self, user_id, pdata):
+        self.ids.add(user_id)
+        self.pinned.pop(user_id, None)
+        self.cache[user_id] = pdata
+        self.cache.move_to_end(user_id)
+        while len(self.cache) > self.capacity:
+            old_id, old_data = self.cache.popitem(last=False)
+            if self.is_dirty is not None and self.is_dirty(old_id):
+                self.pinned[old_id] = old_data
+
+    def release(self, user_ids):
+        """保存が済んだプレイヤーを pinned から外す。"""
+        for user_id in user_ids:
+            if not self.is_dirty(user_id):
+                self.pinned.pop(user_id, None)
+
+    def __delitem__(self, user_id):
+        self.ids.remove(user_id)
+        self.cache.pop(user_id, None)
+        self.pinned.pop(user_id, None)
+
+    def __iter__(self):
+        return iter(list(self.ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class PlayerStore:
+    """変更されたプレイヤーに印をつけておき、タイマー・件数・終了時にまとめて保存する。
+
+    イベントループの上でやるのはレコードを写し取るところまで。JSON への変換とディスクへの
+    書き込みは保存用のスレッドで行う。書き込み中に来た保存の依頼は、次の1回にまとめる。
+    """
+
+    def __init__(self, players, backend, flush_interval=FLUSH_INTERVAL, max_dirty=MAX_DIRTY):
+        self.players = players
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_dirty = max_dirty
+        self.dirty = set()
+        self.writing = set()  # 書き込み中のプレイヤー
+        self.listeners = []  # record() のたびに listener(user_id, pdata) を呼ぶ（索引の更新用）
+        self.load_time = 0.0
+        self.last_flush_time = 0.0  # 直近の保存でイベントループを止めた時間（写し取りの分）
+        self.last_write_time = 0.0  # 直近の保存の書き込みにかかった時間（スレッド側）
+        self.flush_count = 0
+        self.closed = False  # close() のあとは保存しない（保存用スレッドも保存先も閉じている）
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store")
+        self._task = None
+        self._flushing = None
+        self._flush_again = False
+        if isinstance(players, LazyPlayers):
+            players.is_dirty = self.is_dirty
+
+    def load(self):
+        start = time.perf_counter()
+        if isinstance(self.players, LazyPlayers):
+            # 起動時は user_id の一覧だけ読む
+            self.players.load_ids(self.backend)
+        else:
+            for user_id, pdata in self.backend.load().items():
+                self.players[user_id] = pdata
+        self.load_time = time.perf_counter() - start
+
+    def is_dirty(self, user_id):
+        return user_id in self.dirty or user_id in self.writing
+
+    def record(self, kind, changes):
+        """状態の変更を1件記録する。
+
+        changes は {user_id: {"inv": {アイテム: 増減}, "set": {項目: 変更後の値}}}。
+        呼び出す前に player_data は書き換えておくこと。
+        """
+        self.backend.append(kind, changes, self.players)
+        for user_id in changes:
+            self.mark_dirty(user_id)
+            for listener in self.listeners:
+                listener(user_id, self.players.get(user_id))
+
+    def player_names(self):
+        """(user_id, 登録名) を全員分返す。LazyPlayers のときもレコードは読み込まない。"""
+        if isinstance(self.players, LazyPlayers):
+            return self.backend.player_names()
+        return [(user_id, pdata.get("name")) for user_id, pdata in self.players.items()]
+
+    def player_modes(self):
+        """(user_id, 発言モード) をモードを設定している人の分だけ返す。"""
+        if isinstance(self.players, LazyPlayers):
+            return self.backend.player_modes()
+        return [(user_id, pdata["mode"]) for user_id, pdata in self.players.items() if pdata.get("mode")]
+
+    def player_scores(self):
+        """(user_id, level, gold, アイテム総数) を全員分返す（ランキングの作成用）。"""
+        if isinstance(self.players, LazyPlayers):
+            return self.backend.player_scores()
+        return [
+            (user_id, pdata.get("level"), pdata.get("gold"), total_items(pdata.get("inventory") or {}))
+            for user_id, pdata in self.players.items()
+        ]
+
+    def mark_dirty(self, user_id):
+        self.dirty.add(user_id)
+        if len(self.dirty) >= self.max_dirty:
+            self.request_flush()
+
+    def _take_snapshot(self):
+        start = time.perf_counter()
+        user_ids = list(self.dirty)
+        snapshot = self.backend.snapshot(self.players, user_ids)
+        self.dirty.clear()
+        self.writing.update(user_ids)
+        self.last_flush_time = time.perf_counter() - start
+        return user_ids, snapshot
+
+    def _write(self, snapshot):
+        start = time.perf_counter()
+        self.backend.write(snapshot)
+        self.last_write_time = time.perf_counter() - start
+
+    def _finish(self, user_ids, ok):
+        self.writing.difference_update(user_ids)
+        if ok:
+            self.flush_count += 1
+            if isinstance(self.players, LazyPlayers):
+                self.players.release(user_ids)
+        else:
+            # 書き込みに失敗したら印を戻して次回やり直す
+            self.dirty.update(user_ids)
+
+    def flush(self):
+        """その場で保存する（イベントループが動いていないとき・終了時用）。"""
+        if not self.dirty or self.closed:
+            return
+        user_ids, snapshot = self._take_snapshot()
+        ok = False
+        try:
+            self._write(snapshot)
+            ok = True
+        finally:
+            self._finish(user_ids, ok)
+
+    def request_flush(self):
+        """保存を頼む。イベントループの中なら保存用スレッドに任せて、待たずに戻る。"""
+        if self.closed:
+            return None
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return None
+        if self._flushing is not None and not self._flushing.done():
+            # 書き込み中なら、それが終わったあとにもう1回だけ保存する
+            self._flush_again = True
+        else:
+            self._flushing = loop.create_task(self._flush_worker())
+        return self._flushing
+
+    async def flush_async(self):
+        task = self.request_flush()
+        if task is not None:
+            await asyncio.shield(task)
+
+    async def _flush_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._flush_again = False
+            if self.dirty and not self.closed:
+                user_ids, snapshot = self._take_snapshot()
+                ok = False
+                try:
+                    await loop.run_in_executor(self.executor, self._write, snapshot)
+                    ok = True
+                except (OSError, sqlite3.Error, RuntimeError) as e:
+                    # RuntimeError は close() で保存用スレッドが止まったあとに頼んだとき
+                    print(f"⚠️ データの保存に失敗しました: {e}")
+                finally:
+                    self._finish(user_ids, ok)
+            if not self._flush_again:
+                return
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush_async()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    def close(self):
+        if self.closed:
+            return
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        # 書き込み中の分が終わるのを待ってから、残りをその場で保存する
+        self.executor.shutdown(wait=True)
+        self.dirty.update(self.writing)
+        self.writing.clear()
+        try:
+            self.flush()
+        finally:
+            self.closed = True
+            self.backend.close()
+
+
+if __name__ == "__main__":
+    # python storage.py import [game_data.json] [game_data.db]
+    if len(sys.argv) >= 2 and sys.argv[1] == "import":
+        src = sys.argv[2] if len(sys.argv) > 2 else DATA_FILE
+        dst = sys.argv[3] if len(sys.argv) > 3 else DB_FILE
+        count = import_json(src, dst)
+        print(f"✅ {src} から {count} 人分のデータを {dst} に移しました。")
+    else:
+        print("使い方: python storage.py import [game_data.json] [game_data.db]")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# リポジトリ直下のモジュール（bot.py と同じ階層）を import できるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,41 @@
+# 電卓の式の計算（calc.py）
+
+import asyncio
+
+import pytest
+
+import calc
+import workers
+from cache import TTLCache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(calc, "RESULT_CACHE", TTLCache(maxsize=64, ttl=60))
+
+
+def test_worker_without_result_is_a_calc_error(monkeypatch):
+    async def exited(func, *args, timeout):
+        raise RuntimeError("worker process exited without a result")
+
+    monkeypatch.setattr(workers, "run_killable", exited)
+    heavy = "+".join(["7**1180"] * 25)  # その場で計算する量を超える
+    with pytest.raises(calc.CalcError):
+        asyncio.run(calc.calculate(heavy))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("10**999 + 1", str(10**999 + 1)),
+    ("10**999 - 1", str(10**999 - 1)),
+    ("10**999 % 10**999", "0"),
+    ("10**999 // 3", str(10**999 // 3)),
+    ("-1 % 10**999", str(10**999 - 1)),
+])
+def test_results_within_the_digit_cap(text, expected):
+    assert asyncio.run(calc.calculate(text)) == expected
+
+
+@pytest.mark.parametrize("text", ["10**1001", "10**999 * 10**10", "+".join(["10**999"] * 10)])
+def test_results_over_the_digit_cap(text):
+    with pytest.raises(calc.CalcError):
+        asyncio.run(calc.calculate(text))
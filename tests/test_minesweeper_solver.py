@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+import pytest
+
+import minesweeper_solver
+from minesweeper import Minefield
+from minesweeper_solver import analyze, board_view, hint, is_solvable
+
+
+def partly_opened(width, height, bombs, rng, extra_clicks):
+    """真ん中から開けて、さらに安全なマスを extra_clicks 回開けた盤面。"""
+    field = Minefield(width, height, bombs, rng)
+    field.reveal((height // 2) * width + width // 2)
+    for _ in range(extra_clicks):
+        hidden = [i for i in range(field.size) if not field.revealed[i] and not field.mines[i]]
+        if not hidden:
+            break
+        field.reveal(int(rng.choice(hidden)))
+    return field
+
+
+def assert_certain_cells_are_right(field, safe, mines):
+    assert not [i for i in safe if field.mines[i]], "爆弾のマスが「確実に安全」になっている"
+    assert not [i for i in mines if not field.mines[i]], "安全なマスが「確実に爆弾」になっている"
+
+
+@pytest.mark.parametrize("max_component", [48, 6, 0])
+def test_certain_cells_match_the_real_board(monkeypatch, max_component):
+    # max_component を小さくすると、数え上げずに目安で済ませるつながりが混ざる
+    monkeypatch.setattr(minesweeper_solver, "MAX_COMPONENT", max_component)
+    rng = np.random.default_rng(1234)
+    for trial in range(60):
+        width, height, bombs = [(10, 10, 30), (9, 9, 10), (16, 16, 40), (8, 8, 20)][trial % 4]
+        field = partly_opened(width, height, bombs, rng, trial % 5)
+        safe, mines, chances = analyze(width, height, board_view(field), bombs)
+        assert_certain_cells_are_right(field, safe, mines)
+        assert all(0.0 <= p <= 1.0 for p in chances.values())
+
+
+def scattered(width, height, bombs, rng):
+    """安全なマスをばらばらに開けた盤面（大きいつながりと小さいつながりが混ざりやすい）。"""
+    field = Minefield(width, height, bombs, rng)
+    field.place(0)
+    safe = [i for i in range(field.size) if not field.mines[i]]
+    count = int(rng.integers(field.size // 10, field.size * 2 // 5))
+    for i in rng.choice(safe, count, replace=False):
+        field.revealed[i] = 1
+    return field
+
+
+@pytest.mark.parametrize("max_component", [48, 16])
+def test_rough_components_do_not_make_cells_certain(monkeypatch, max_component):
+    # 目安で済ませたつながりの爆弾数を全体の重みに入れると、爆弾が「確実に安全」と出ていた
+    monkeypatch.setattr(minesweeper_solver, "MAX_COMPONENT", max_component)
+    rng = np.random.default_rng(5)
+    for _ in range(400):
+        field = scattered(10, 10, 30, rng)
+        view = board_view(field)
+        # 時間は短めに（大きいつながりは時間切れで目安になる。本番でもヒントは1秒まで）
+        safe, mines, _ = analyze(10, 10, view, 30, deadline=time.perf_counter() + 0.02)
+        assert_certain_cells_are_right(field, safe, mines)
+        cell, _, certain, known_mines = hint(10, 10, view, 30, time_budget=0.02)
+        if certain:
+            assert not field.mines[cell]
+        assert all(field.mines[i] for i in known_mines)
+
+
+def test_timeout_does_not_invent_certainty():
+    rng = np.random.default_rng(99)
+    for _ in range(20):
+        field = partly_opened(16, 16, 40, rng, 1)
+        # 時間切れ（deadline が過去）だと数え上げは全部目安になる
+        safe, mines, _ = analyze(16, 16, board_view(field), 40, deadline=time.perf_counter() - 1)
+        assert_certain_cells_are_right(field, safe, mines)
+
+
+def test_is_solvable_stops_on_explosion(monkeypatch):
+    field = Minefield(5, 5, 3, np.random.default_rng(0))
+    field.set_mines([0, 1, 2])
+    mine = 0
+
+    def wrong(width, height, view, bombs, mines=(), deadline=None, probabilities=True):
+        return {mine}, set(), None
+
+    monkeypatch.setattr(minesweeper_solver, "analyze", wrong)
+    start = time.perf_counter()
+    # 5 は数字のマスなので1マスだけ開く。爆発したらその場で False（時間切れまで回らない）
+    assert is_solvable(field, 5, start + 30) is False
+    assert time.perf_counter() - start < 1
+
+
+def test_generated_boards_are_solved_from_the_start():
+    positions, _ = minesweeper_solver.generate_solvable(9, 9, 10, 40, time_budget=5.0)
+    assert positions is not None
+    field = Minefield(9, 9, 10)
+    field.set_mines(positions)
+    assert not field.mines[40]
+    assert is_solvable(field, 40, time.perf_counter() + 5)
+    assert field.won
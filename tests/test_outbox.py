@@ -0,0 +1,35 @@
+# 長いメッセージの分け方（outbox.split_text / pack）
+
+import pytest
+
+from outbox import FENCE, MESSAGE_LIMIT, pack, split_text
+
+
+@pytest.mark.parametrize("text", [
+    "```py\n" + "x" * 3000,
+    "```<" + "a" * 3000,
+    "```\n" + "a" * 3000,
+    "```" + "a" * 3000,
+])
+def test_reopened_fence_makes_progress(text):
+    pieces = split_text(text)
+    assert all(len(piece) <= MESSAGE_LIMIT for piece in pieces)
+    assert all(piece.count(FENCE) % 2 == 0 for piece in pieces[:-1])
+    assert "".join(pieces).count("a") + "".join(pieces).count("x") == 3000
+
+
+def test_long_repost_in_code_block_is_packed():
+    # 猫モードで投稿し直すと 2000 文字のコードブロックが 2000 文字を超える
+    body = "名前 > " + "```\n" + "a" * 1996 + "にゃん♪"
+    chunks = pack([body])
+    assert len(chunks) >= 2
+    assert all(len(content) <= MESSAGE_LIMIT and indexes == [0] for content, indexes in chunks)
+    assert "".join(content for content, _ in chunks).count("a") == 1996
+
+
+def test_split_prefers_newlines_and_spaces():
+    text = ("word " * 300 + "\n") * 3
+    pieces = split_text(text)
+    assert all(len(piece) <= MESSAGE_LIMIT for piece in pieces)
+    assert all(not piece.endswith("wor") for piece in pieces)
+    assert " ".join(pieces).split() == text.split()
@@ -0,0 +1,70 @@
+# 返事待ちの振り分け（replies.ReplyRouter）
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from replies import ReplyRouter
+
+
+def message(channel_id, author_id, content):
+    return SimpleNamespace(
+        channel=SimpleNamespace(id=channel_id),
+        author=SimpleNamespace(id=author_id),
+        content=content,
+    )
+
+
+def yes_no(m):
+    return m.content.lower() in ("yes", "no")
+
+
+def test_button_answer_goes_to_its_own_waiter():
+    async def main():
+        router = ReplyRouter()
+        tenki = asyncio.ensure_future(router.wait(1, 2, timeout=1.0))
+        await asyncio.sleep(0)
+        trade = router.expect(1, 2, timeout=1.0, accept=yes_no)
+        assert trade.resolve(True)
+        assert await trade.result() is True
+        assert not tenki.done()  # 先に待っていた !tenki には届かない
+
+        router.dispatch(message(1, 2, "Tokyo"))
+        assert (await tenki).content == "Tokyo"
+        assert not trade.resolve(False)  # 2回目は渡らない
+
+    asyncio.run(main())
+
+
+def test_message_goes_to_first_waiter_that_accepts_it():
+    async def main():
+        router = ReplyRouter()
+        trade = router.expect(1, 2, timeout=1.0, accept=yes_no)
+        tenki = asyncio.ensure_future(router.wait(1, 2, timeout=1.0))
+        await asyncio.sleep(0)
+
+        assert router.dispatch(message(1, 2, "New York"))
+        assert (await tenki).content == "New York"
+        assert not trade.future.done()
+
+        assert router.dispatch(message(1, 2, "yes"))
+        assert (await trade.result()).content == "yes"
+        assert not router.dispatch(message(1, 2, "no"))
+        assert router.waiters == {}
+
+    asyncio.run(main())
+
+
+def test_timeout_and_cancel_clean_up():
+    async def main():
+        router = ReplyRouter()
+        with pytest.raises(asyncio.TimeoutError):
+            await router.wait(1, 2, timeout=0.05)
+        waiter = router.expect(1, 2, timeout=1.0)
+        waiter.cancel()
+        assert not waiter.resolve(True)
+        assert not router.dispatch(message(1, 2, "hello"))
+        assert router.waiters == {}
+
+    asyncio.run(main())
@@ -0,0 +1,213 @@
+# !tenki の地名検索・天気・HTTP クライアントを、手元に立てた代わりのサーバーに向けて試す
+#   （Nominatim / Open-Meteo には問い合わせない）
+
+import asyncio
+import contextlib
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp import test_utils
+
+import weather
+from cache import TTLCache
+from http_client import HttpClient
+
+CITIES = {
+    "tokyo": ("35.6812", "139.7671"),
+    "osaka": ("34.6937", "135.5023"),
+    "new york": ("40.7128", "-74.0060"),
+}
+
+
+class StandIn:
+    """Nominatim と Open-Meteo の代わり。来た要求を数えておく。"""
+
+    def __init__(self):
+        self.geocode_calls = []   # (q, 受け取った時刻)
+        self.weather_calls = []   # (latitude, longitude)
+        self.geocode_delay = 0.0
+        self.weather_delay = 0.0
+        self.status = 200
+        self.active = {"search": 0, "forecast": 0}
+        self.max_active = {"search": 0, "forecast": 0}
+        self.peers = set()
+        self.user_agents = set()
+
+    @contextlib.contextmanager
+    def _track(self, name):
+        self.active[name] += 1
+        self.max_active[name] = max(self.max_active[name], self.active[name])
+        try:
+            yield
+        finally:
+            self.active[name] -= 1
+
+    async def search(self, request):
+        self.peers.add(request.transport.get_extra_info("peername"))
+        self.user_agents.add(request.headers.get("User-Agent"))
+        with self._track("search"):
+            q = request.query["q"]
+            self.geocode_calls.append((q, time.monotonic()))
+            await asyncio.sleep(self.geocode_delay)
+            if self.status != 200:
+                return web.Response(status=self.status)
+            coords = CITIES.get(q.strip().casefold())
+            body = [{"lat": coords[0], "lon": coords[1]}] if coords else []
+            return web.json_response(body)
+
+    async def forecast(self, request):
+        with self._track("forecast"):
+            self.weather_calls.append((request.query["latitude"], request.query["longitude"]))
+            await asyncio.sleep(self.weather_delay)
+            if self.status != 200:
+                return web.Response(status=self.status)
+            return web.json_response({"current_weather": {"temperature": 21.5, "weathercode": 1}})
+
+    async def slow(self, request):
+        await asyncio.sleep(5)
+        return web.json_response({})
+
+
+@contextlib.asynccontextmanager
+async def stand_in_server(monkeypatch, interval=0.0):
+    stand_in = StandIn()
+    app = web.Application()
+    app.router.add_get("/search", stand_in.search)
+    app.router.add_get("/v1/forecast", stand_in.forecast)
+    app.router.add_get("/slow", stand_in.slow)
+    server = test_utils.TestServer(app)
+    await server.start_server()
+    monkeypatch.setattr(weather, "NOMINATIM_URL", str(server.make_url("/search")))
+    monkeypatch.setattr(weather, "OPEN_METEO_URL", str(server.make_url("/v1/forecast")))
+    monkeypatch.setattr(weather, "NOMINATIM_SPACING", weather.Spacing(interval))
+    # テストごとに空のキャッシュにする
+    monkeypatch.setattr(weather, "GEOCODE_CACHE", TTLCache(maxsize=64, ttl=60))
+    monkeypatch.setattr(weather, "WEATHER_CACHE", TTLCache(maxsize=64, ttl=60))
+    http = HttpClient()
+    await http.start()
+    try:
+        yield stand_in, server, http
+    finally:
+        await http.close()
+        await server.close()
+
+
+def test_geocode_and_current_weather(monkeypatch):
+    async def main():
+        async with stand_in_server(monkeypatch) as (stand_in, _, http):
+            coords = await weather.geocode(http, "Tokyo")
+            assert coords == (35.6812, 139.7671)
+            current = await weather.current_weather(http, *coords)
+            assert current["temperature"] == 21.5
+            # 「ＴＯＫＹＯ」「tokyo 」は同じキー、近い座標は同じ天気
+            assert await weather.geocode(http, "ＴＯＫＹＯ") == coords
+            assert await weather.geocode(http, "tokyo ") == coords
+            await weather.current_weather(http, 35.6849, 139.7711)
+            assert len(stand_in.geocode_calls) == 1
+            assert stand_in.weather_calls == [("35.68", "139.77")]
+            assert stand_in.user_agents == {http.user_agent}
+
+    asyncio.run(main())
+
+
+def test_not_found_and_errors_are_not_cached(monkeypatch):
+    async def main():
+        async with stand_in_server(monkeypatch) as (stand_in, _, http):
+            assert await weather.geocode(http, "Atlantis") is None
+            assert await weather.geocode(http, "Atlantis") is None
+            assert len(stand_in.geocode_calls) == 2
+
+            stand_in.status = 503
+            assert await weather.geocode(http, "Osaka") is None
+            assert await weather.current_weather(http, 34.69, 135.50) is None
+            stand_in.status = 200
+            assert await weather.geocode(http, "Osaka") == (34.6937, 135.5023)
+
+    asyncio.run(main())
+
+
+def test_http_client_status_timeout_and_connection_errors(monkeypatch):
+    async def main():
+        async with stand_in_server(monkeypatch) as (_, server, http):
+            status, data = await http.get_json(str(server.make_url("/missing")))
+            assert (status, data) == (404, None)
+
+            quick = HttpClient(timeout=aiohttp.ClientTimeout(total=0.1))
+            try:
+                with pytest.raises(asyncio.TimeoutError):
+                    await quick.get_json(str(server.make_url("/slow")))
+                # weather 側は時間切れを None にする
+                monkeypatch.setattr(weather, "NOMINATIM_URL", str(server.make_url("/slow")))
+                assert await weather.geocode(quick, "Tokyo") is None
+            finally:
+                await quick.close()
+
+            port = server.port
+        # サーバーを止めたあとは接続できない
+        closed = HttpClient()
+        try:
+            with pytest.raises(aiohttp.ClientError):
+                await closed.get_json(f"http://127.0.0.1:{port}/search", {"q": "Tokyo"})
+        finally:
+            await closed.close()
+
+    asyncio.run(main())
+
+
+def test_http_client_reuses_connections(monkeypatch):
+    async def main():
+        async with stand_in_server(monkeypatch) as (stand_in, server, http):
+            for _ in range(5):
+                await http.get_json(str(server.make_url("/search")), {"q": "Tokyo"})
+            assert len(stand_in.peers) == 1  # keep-alive で同じ接続を使い回している
+
+    asyncio.run(main())
+
+
+def test_concurrent_lookups_are_coalesced(monkeypatch):
+    async def main():
+        async with stand_in_server(monkeypatch) as (stand_in, _, http):
+            stand_in.geocode_delay = 0.05
+            stand_in.weather_delay = 0.05
+            results = await asyncio.gather(*(weather.geocode(http, "Osaka") for _ in range(20)))
+            assert set(results) == {(34.6937, 135.5023)}
+            assert len(stand_in.geocode_calls) == 1
+            assert weather.GEOCODE_CACHE.stats()["coalesced"] == 19
+
+            await asyncio.gather(*(weather.current_weather(http, 34.69, 135.50) for _ in range(20)))
+            assert len(stand_in.weather_calls) == 1
+
+    asyncio.run(main())
+
+
+def test_lookup_weather_spaces_geocoding_only(monkeypatch):
+    async def main():
+        async with stand_in_server(monkeypatch, interval=0.1) as (stand_in, _, http):
+            stand_in.weather_delay = 0.3
+            results = await weather.lookup_weather(http, ["Tokyo", "Atlantis", "Osaka", "New York"])
+            assert [city for city, _, _ in results] == ["Tokyo", "Atlantis", "Osaka", "New York"]
+            assert results[1][1:] == (None, None)
+            assert all(current is not None for _, coords, current in results if coords)
+
+            # 地名検索は1件ずつ、間をあけて
+            assert stand_in.max_active["search"] == 1
+            times = [t for _, t in stand_in.geocode_calls]
+            assert all(b - a >= 0.09 for a, b in zip(times, times[1:]))
+            # 天気は並べて問い合わせる
+            assert stand_in.max_active["forecast"] > 1
+
+    asyncio.run(main())
+
+
+def test_ttl_cache_expires_and_evicts():
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # 一番使われていない "b" が消える
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None
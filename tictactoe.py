@@ -0,0 +1,111 @@
+# ------------------------------
+# ○×ゲームの盤面と CPU
+#   盤面は 9 ビットの整数2つ（ビット番号 = マスの番号 0〜8）
+#   起動時に全局面を読み切った表を作っておき、CPU の手は表を引くだけ
+# ------------------------------
+
+import random
+
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,  # 横
+    0b001001001, 0b010010010, 0b100100100,  # 縦
+    0b100010001, 0b001010100,               # 斜め
+)
+FULL = 0b111111111
+
+# WINNING[bits] … その石の並びに3つ揃いがあるか（512通りを先に計算しておく）
+WINNING = tuple(any(bits & mask == mask for mask in WIN_MASKS) for bits in range(1 << 9))
+
+
+def cells(bits):
+    return [i for i in range(9) if bits >> i & 1]
+
+
+def _solve(me, opponent, table):
+    """手番側（石 me）から見た点数を返し、最善手を table に入れる。
+
+    勝ちは早いほど、負けは遅いほど点数がよい（10 - 手数 / 手数 - 10）。
+    """
+    key = me | opponent << 9
+    if key in table:
+        return table[key][0]
+    empty = FULL & ~(me | opponent)
+    if not empty:
+        table[key] = (0, ())
+        return 0
+    moves = (me | opponent).bit_count()
+    best, best_cells = -100, []
+    for cell in cells(empty):
+        bit = 1 << cell
+        if WINNING[me | bit]:
+            score = 10 - moves
+        else:
+            score = -_solve(opponent, me | bit, table)
+        if score > best:
+            best, best_cells = score, [cell]
+        elif score == best:
+            best_cells.append(cell)
+    table[key] = (best, tuple(best_cells))
+    return best
+
+
+def build_table():
+    """空の盤面から届く全局面（手番側から見て）の (点数, 最善手) の表。"""
+    table = {}
+    _solve(0, 0, table)
+    return table
+
+
+PERFECT = build_table()
+
+
+def perfect_move(me, opponent):
+    return random.choice(PERFECT[me | opponent << 9][1])
+
+
+def greedy_move(me, opponent):
+    """勝てるなら勝つ、負けそうなら止める、それ以外はでたらめ（1手先だけ読む）。"""
+    empty = cells(FULL & ~(me | opponent))
+    for bits in (me, opponent):
+        for cell in empty:
+            if WINNING[bits | 1 << cell]:
+                return cell
+    return random.choice(empty)
+
+
+def random_move(me, opponent):
+    return random.choice(cells(FULL & ~(me | opponent)))
+
+
+MOVES = {
+    "perfect": perfect_move,
+    "greedy": greedy_move,
+    "random": random_move,
+}
+
+
+class TicTacToe:
+    """bits[0] が人、bits[1] が CPU の石。"""
+
+    def __init__(self, difficulty="greedy"):
+        self.bits = [0, 0]
+        self.choose = MOVES[difficulty]
+
+    @property
+    def occupied(self):
+        return self.bits[0] | self.bits[1]
+
+    def is_free(self, cell):
+        return not self.occupied >> cell & 1
+
+    def play(self, cell, player):
+        self.bits[player] |= 1 << cell
+
+    def is_win(self, player):
+        return WINNING[self.bits[player]]
+
+    def is_full(self):
+        return self.occupied == FULL
+
+    def cpu_move(self):
+        return self.choose(self.bits[1], self.bits[0])
@@ -0,0 +1,84 @@
+# ------------------------------
+# プレイヤーごとのロックとトレードの預かり（エスクロー）
+#   await をまたいで「確認 → 書き換え」するコマンドはここを通す
+# ------------------------------
+
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+
+from inventory import add_item, remove_item
+
+
+class PlayerLocks:
+    """プレイヤーごとの asyncio.Lock。誰も使っていないロックは自動で消える。"""
+
+    def __init__(self):
+        self._locks = weakref.WeakValueDictionary()
+
+    def get(self, user_id):
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[user_id] = lock
+        return lock
+
+    @asynccontextmanager
+    async def hold(self, *user_ids):
+        """複数人のロックを user_id 順に取る（順番を固定してデッドロックを防ぐ）。"""
+        locks = [self.get(user_id) for user_id in sorted(set(user_ids))]
+        acquired = []
+        try:
+            for lock in locks:
+                await lock.acquire()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+
+class Escrow:
+    """トレード中のアイテムを送り主のインベントリから預かっておく。
+
+    hold() で送り主から抜き、commit() で相手に渡す。rollback() なら送り主に戻す。
+    預かっている間は送り主が同じアイテムを二重に使うことはできない。
+    """
+
+    def __init__(self, locks, store, sender_id, item, count=1):
+        self.locks = locks
+        self.store = store
+        self.sender_id = sender_id
+        self.item = item
+        self.count = count
+        self.state = "new"
+
+    async def hold(self):
+        async with self.locks.hold(self.sender_id):
+            inv = self.store.players[self.sender_id].setdefault("inventory", {})
+            if not remove_item(inv, self.item, self.count):
+                return False
+            self.store.record("trade_hold", {self.sender_id: {"inv": {self.item: -self.count}}})
+        self.state = "held"
+        return True
+
+    async def commit(self, receiver_id):
+        if self.state != "held":
+            raise RuntimeError(f"escrow is {self.state}")
+        async with self.locks.hold(receiver_id):
+            inv = self.store.players[receiver_id].setdefault("inventory", {})
+            add_item(inv, self.item, self.count)
+            self.store.record("trade", {
+                self.sender_id: {},
+                receiver_id: {"inv": {self.item: self.count}},
+            })
+        self.state = "committed"
+
+    async def rollback(self):
+        if self.state != "held":
+            return
+        async with self.locks.hold(self.sender_id):
+            inv = self.store.players[self.sender_id].setdefault("inventory", {})
+            add_item(inv, self.item, self.count)
+            self.store.record("trade_cancel", {self.sender_id: {"inv": {self.item: self.count}}})
+        self.state = "rolled_back"
@@ -0,0 +1,143 @@
+# ------------------------------
+# !tenki 用の地名検索（Nominatim）と天気（Open-Meteo）
+#   URL は環境変数で差し替えられる（手元のテスト用サーバーに向けるときなど）
+#   結果はキャッシュする（座標は長め、天気は10分）
+#   Nominatim は1秒に1件までなので、地名検索だけは間をあけて1件ずつ送る
+# ------------------------------
+
+import asyncio
+import os
+
+import aiohttp
+
+from cache import TTLCache
+from indexes import normalize_name
+
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+
+GEOCODE_CACHE = TTLCache(maxsize=2048, ttl=7 * 24 * 60 * 60)  # 都市の座標はまず変わらない
+WEATHER_CACHE = TTLCache(maxsize=512, ttl=10 * 60)
+MAX_TENKI_CITIES = 10   # !tenki で一度に調べられる都市の数
+TENKI_CONCURRENCY = 4   # 同時に問い合わせる天気（Open-Meteo）の数
+NOMINATIM_INTERVAL = float(os.getenv("NOMINATIM_INTERVAL", "1.0"))  # 地名検索の間隔（秒）
+
+# Open-Meteo の weathercode → 日本語
+WEATHER_DESC = {
+    0: "晴れ",
+    1: "主に晴れ",
+    2: "部分的に曇り",
+    3: "曇り",
+    45: "霧",
+    48: "凍結霧",
+    51: "弱い霧雨",
+    53: "中程度の霧雨",
+    55: "強い霧雨",
+    56: "凍結弱い霧雨",
+    57: "凍結強い霧雨",
+    61: "弱い雨",
+    63: "中程度の雨",
+    65: "強い雨",
+    66: "凍結弱い雨",
+    67: "凍結強い雨",
+    71: "弱い雪",
+    73: "中程度の雪",
+    75: "強い雪",
+    77: "あられ",
+    80: "弱いにわか雨",
+    81: "中程度のにわか雨",
+    82: "強いにわか雨",
+    85: "弱いにわか雪",
+    86: "強いにわか雪",
+    95: "雷雨",
+    96: "弱い雷雨とあられ",
+    99: "強い雷雨とあられ",
+}
+
+
+class Spacing:
+    """wait() が前の wait() から interval 秒以上あけて戻るようにする（1件ずつ順番に）。"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.next_time = 0.0
+        self._lock = None
+        self._loop = None
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            delay = self.next_time - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.next_time = loop.time() + self.interval
+
+
+NOMINATIM_SPACING = Spacing(NOMINATIM_INTERVAL)
+
+
+async def geocode(http, city_name):
+    """地名から (緯度, 経度) を返す。見つからない・取得できないときは None。"""
+    # 「ＴＯＫＹＯ」「Tokyo」「tokyo 」は同じキーにする
+    key = normalize_name(city_name)
+    return await GEOCODE_CACHE.get_or_fetch(key, lambda: _fetch_geocode(http, city_name))
+
+
+async def _fetch_geocode(http, city_name):
+    params = {
+        "q": city_name,
+        "format": "json",
+        "limit": 1,
+    }
+    await NOMINATIM_SPACING.wait()
+    try:
+        status, data = await http.get_json(NOMINATIM_URL, params)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+    if status != 200 or not data:
+        return None
+    return float(data[0]["lat"]), float(data[0]["lon"])
+
+
+async def current_weather(http, lat, lon):
+    """現在の天気（Open-Meteo の current_weather）を返す。取得できないときは None。"""
+    # 小数2桁（1km 程度）に丸めて、同じ街の問い合わせをまとめる
+    lat, lon = round(lat, 2), round(lon, 2)
+    return await WEATHER_CACHE.get_or_fetch((lat, lon), lambda: _fetch_current_weather(http, lat, lon))
+
+
+async def _fetch_current_weather(http, lat, lon):
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "current_weather": "true",
+        "timezone": "Asia/Tokyo",
+    }
+    try:
+        status, data = await http.get_json(OPEN_METEO_URL, params)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+    if status != 200 or data is None:
+        return None
+    return data.get("current_weather", {})
+
+
+async def lookup_weather(http, cities, limit=TENKI_CONCURRENCY):
+    """複数の都市をまとめて調べる。都市ごとに (都市名, 座標, 現在の天気) を入力と同じ順で返す。
+
+    見つからなければ座標が None、天気が取れなければ天気が None になる。
+    地名検索は NOMINATIM_SPACING で1件ずつ、天気は limit 件まで同時に問い合わせる。
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def lookup(city):
+        coords = await geocode(http, city)
+        if coords is None:
+            return city, None, None
+        async with semaphore:
+            return city, coords, await current_weather(http, *coords)
+
+    return await asyncio.gather(*(lookup(city) for city in cities))
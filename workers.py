@@ -0,0 +1,84 @@
+# ------------------------------
+# 重い計算（ゲームの CPU の思考など）を別プロセスで動かす
+#   イベントループを止めないように、await run_in_process(関数, 引数...) で呼ぶ
+#   関数も引数もプロセス間で受け渡すので、モジュール直下の関数とただの値だけにすること
+#   どれだけかかるか分からない計算は run_killable（1回ごとのプロセスで、時間切れなら止める）
+# ------------------------------
+
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+MAX_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+MAX_KILLABLE = 2  # run_killable で同時に動かすプロセスの数
+
+# fork だと、スレッド（保存用・aiohttp の名前解決など）が動いているプロセスをそのまま複製するので、
+# 子プロセスがロックを持ったまま止まることがある。forkserver（使えなければ spawn）で作る。
+# forkserver はスレッドのない専用のプロセスで bot.py を1回だけ読み込み、子はそこから複製する
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+_context = multiprocessing.get_context(START_METHOD)
+
+_pool = None
+_killable = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=_context)
+    return _pool
+
+
+async def run_in_process(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), functools.partial(func, *args, **kwargs))
+
+
+def _call(conn, func, args):
+    try:
+        conn.send((True, func(*args)))
+    except Exception as e:
+        conn.send((False, e))
+    finally:
+        conn.close()
+
+
+async def run_killable(func, *args, timeout):
+    """func(*args) を専用のプロセスで動かす。timeout 秒で終わらなければプロセスごと止めて asyncio.TimeoutError。
+
+    プールのプロセスは途中で止められないので、止める必要がある計算はこちらを使う。
+    func が投げた例外はそのまま投げ直す。
+    """
+    global _killable
+    if _killable is None:
+        _killable = asyncio.Semaphore(MAX_KILLABLE)
+    loop = asyncio.get_running_loop()
+    async with _killable:
+        receiver, sender = _context.Pipe(duplex=False)
+        process = _context.Process(target=_call, args=(sender, func, args), daemon=True)
+        process.start()
+        sender.close()
+        try:
+            if not await loop.run_in_executor(None, receiver.poll, timeout):
+                raise asyncio.TimeoutError
+            try:
+                ok, value = receiver.recv()
+            except EOFError:
+                raise RuntimeError("worker process exited without a result") from None
+        finally:
+            if process.is_alive():
+                process.kill()
+            await loop.run_in_executor(None, process.join)
+            receiver.close()
+    if not ok:
+        raise value
+    return value
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None